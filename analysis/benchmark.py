@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the analysis pipeline
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Runs the main pipeline stages at several dataset sizes (1k, 100k and 1M
+rows by default) and records, for each stage:
+
+- wall time: the best of --repeats runs (3 by default, so a cold first
+  run does not count as a regression);
+- peak memory: the peak traced allocation (Python objects and NumPy /
+  pandas buffers) of one extra run under tracemalloc.
+
+Datasets are generated by synthetic_survey's model of the real survey,
+restricted to the columns the stages read, and are reused between runs.
+The real survey only has about 900 distinct theme-song answers. Each
+generated answer therefore gets a few words, drawn from all real answers,
+appended to it, so the text stages see a distinct answer on almost every
+row. Results are written to data/benchmarks/latest.json and compared
+with data/benchmarks/baseline.json; a stage that is slower or larger than
+the baseline by more than --tolerance is reported as a regression and the
+script exits with status 1. Everything runs offline.
+
+Usage:
+    python benchmark.py                          # compare against the baseline
+    python benchmark.py --sizes 1000 100000      # smaller sizes only
+    python benchmark.py --save-baseline          # record a new baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from generate_survey_data import COUNTED_COLUMNS, LISTENING_GRID_PREFIX, generate_survey_data
+from persona_clustering import analyze_personas, create_personas, feature_engineering, find_optimal_clusters
+from sentiment_enhanced import analyze_word_frequency, extract_emotional_themes
+from sentiment_scorer import LexiconScorer, load_sentiment_lexicon
+from survey_cache import CACHE_DIR, RAW_DATA_PATH, load_survey_data
+from synthetic_survey import fit_survey_model, generate_chunks
+from token_cache import NON_ANSWERS, open_ended_responses
+
+BENCHMARK_DATA_DIR = CACHE_DIR / "benchmark"
+RESULTS_DIR = Path(__file__).parent.parent / "data" / "benchmarks"
+BASELINE_FILE = RESULTS_DIR / "baseline.json"
+LATEST_FILE = RESULTS_DIR / "latest.json"
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.25
+WRITE_CHUNK_ROWS = 100000
+EXTRA_WORDS_PER_ANSWER = 4
+
+# Differences below these floors are timer and allocator noise, not regressions
+MIN_WALL_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 1.0
+
+OPEN_ENDED_COLUMN = 'Q18_Life_theme_song'
+
+# Columns read by the benchmarked stages (clustering features, persona
+# profiles, survey_data.json counts and the open-ended text)
+BENCHMARK_COLUMNS = [
+    'participant_id',
+    'Q1_Relationship_with_music',
+    'Q2_Discovering_music',
+    'AgeGroup_Broad',
+    'Province',
+    'Gender',
+    'Education',
+    'Q4_Music_format_changes',
+    'Q9_Music_preference_these_days',
+    'Q10_Songs_by_AI',
+    'Q11_Use_of_dead_artists_voice_feelings',
+    OPEN_ENDED_COLUMN
+]
+
+
+def benchmark_columns(header):
+    """Columns of the raw survey kept in the benchmark datasets"""
+    wanted = set(BENCHMARK_COLUMNS) | set(COUNTED_COLUMNS)
+    return [col for col in header if col in wanted or LISTENING_GRID_PREFIX in col]
+
+
+def distinct_answers(answers, words, rng, n_words=EXTRA_WORDS_PER_ANSWER):
+    """Open-ended answers with n_words drawn from words appended (placeholders and gaps kept)"""
+    answers = pd.Series(answers, dtype=object)
+    real = answers.notna() & ~answers.isin(NON_ANSWERS)
+    drawn = words[rng.integers(0, len(words), size=(int(real.sum()), n_words))]
+    suffix = pd.Series(drawn[:, 0], dtype=object)
+    for column in range(1, n_words):
+        suffix = suffix + ' ' + drawn[:, column]
+    answers[real] = answers[real] + ' ' + suffix.to_numpy()
+    return answers
+
+
+def build_dataset(n_rows, data_path=RAW_DATA_PATH, output_dir=BENCHMARK_DATA_DIR, random_state=42):
+    """Generate an n_rows synthetic survey and write it as a CSV (reused if present)"""
+    output_file = Path(output_dir) / f"synthetic_{n_rows}.csv"
+    if output_file.exists():
+        return output_file
+    print(f"Building {n_rows:,}-row benchmark dataset...")
+    
+    header = pd.read_csv(data_path, nrows=0).columns
+    source = pd.read_csv(data_path, usecols=benchmark_columns(header))
+    model = fit_survey_model(source)
+    # Every word of the real answers, so frequent words are drawn more often
+    words = open_ended_responses(source, OPEN_ENDED_COLUMN).str.split().explode().to_numpy(dtype=object)
+    rng = np.random.default_rng(random_state)
+    
+    # Written in chunks so the largest sizes never sit in memory at once
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = output_file.with_suffix('.tmp')
+    try:
+        for index, chunk in enumerate(generate_chunks(model, n_rows, WRITE_CHUNK_ROWS, random_state)):
+            chunk[OPEN_ENDED_COLUMN] = distinct_answers(chunk[OPEN_ENDED_COLUMN], words, rng).to_numpy()
+            chunk.to_csv(tmp_file, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+    except BaseException:
+        # Leave no half-written file behind
+        tmp_file.unlink(missing_ok=True)
+        raise
+    tmp_file.replace(output_file)
+    return output_file
+
+
+def measure(func, args=(), kwargs=None, repeats=1, memory=True):
+    """Best wall time over repeats and the peak traced memory of one more run"""
+    kwargs = kwargs or {}
+    timings = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+    
+    peak_memory_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                func(*args, **kwargs)
+            peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return result, {'wall_seconds': min(timings), 'peak_memory_mb': peak_memory_mb}
+
+
+def run_size(n_rows, repeats=DEFAULT_REPEATS, memory=True, work_dir=None):
+    """Benchmark every stage on one dataset size"""
+    data_path = build_dataset(n_rows)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = load_survey_data(data_path)
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix="benchmark_"))
+    results = {}
+    
+    def stage(name, func, *args, **kwargs):
+        result, metrics = measure(func, args, kwargs, repeats, memory)
+        results[name] = metrics
+        peak = f", peak {metrics['peak_memory_mb']:.1f} MB" if memory else ""
+        print(f"   {name}: {metrics['wall_seconds']:.3f}s{peak}")
+        return result
+    
+    print(f"\n{n_rows:,} rows")
+    feature_encoded, _ = stage('feature_engineering', feature_engineering, df)
+    
+    # Exact silhouette is O(N^2) and even the sampled estimate scans every row
+    # per k, so the sweep selects k with the linear-time Calinski-Harabasz
+    # criterion and persona creation scores a silhouette sample
+    stage('find_optimal_clusters', find_optimal_clusters, feature_encoded, criterion='calinski_harabasz')
+    assignments, _, _, _ = stage('create_personas', create_personas, df, feature_encoded, silhouette_mode='sampled')
+    stage('analyze_personas', analyze_personas, df, assignments['persona_cluster'])
+    
+    responses = open_ended_responses(df, OPEN_ENDED_COLUMN)
+    scorer = LexiconScorer(*load_sentiment_lexicon())
+    stage('analyze_word_frequency', analyze_word_frequency, responses)
+    stage('extract_emotional_themes', extract_emotional_themes, responses)
+    stage('score_sentiment', scorer.label, responses)
+    stage('generate_survey_data', generate_survey_data, data_path, output_dir=work_dir)
+    return results
+
+
+def environment():
+    """Machine details stored with the results; timings only compare on like hardware"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Stages slower or larger than the baseline by more than the tolerance"""
+    regressions = []
+    for size, stages in results['sizes'].items():
+        for name, metrics in stages.items():
+            reference = baseline.get('sizes', {}).get(size, {}).get(name)
+            if reference is None:
+                continue
+            checks = [('wall_seconds', MIN_WALL_DELTA, 's'), ('peak_memory_mb', MIN_MEMORY_DELTA_MB, ' MB')]
+            for metric, floor, unit in checks:
+                current, previous = metrics.get(metric), reference.get(metric)
+                if current is None or previous is None:
+                    continue
+                if current > previous * (1 + tolerance) and current - previous > floor:
+                    regressions.append(f"{int(size):,} rows {name}: {metric} {previous:.3f}{unit} -> "
+                                       f"{current:.3f}{unit} ({current / previous - 1:+.0%})")
+    return regressions
+
+
+def save_results(results, output_file):
+    """Write benchmark results as JSON"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    return output_file
+
+
+def main(sizes=DEFAULT_SIZES, repeats=DEFAULT_REPEATS, memory=True, tolerance=DEFAULT_TOLERANCE,
+         baseline_file=BASELINE_FILE, save_baseline=False):
+    """Run the benchmark suite and compare it with the stored baseline"""
+    print("Canadian Music DNA - Pipeline Benchmarks")
+    print("="*60)
+    
+    results = {'environment': environment(), 'repeats': repeats, 'sizes': {}}
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+        for n_rows in sizes:
+            results['sizes'][str(n_rows)] = run_size(n_rows, repeats, memory, work_dir)
+    
+    print(f"\nResults saved to: {save_results(results, LATEST_FILE)}")
+    if save_baseline:
+        print(f"Baseline saved to: {save_results(results, baseline_file)}")
+        return 0
+    
+    baseline_file = Path(baseline_file)
+    if not baseline_file.exists():
+        print(f"No baseline at {baseline_file}; run with --save-baseline to record one")
+        return 0
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != results['environment']:
+        print("Warning: baseline was recorded on a different machine or library versions")
+    
+    regressions = compare(results, baseline, tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%} of the baseline:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+    print(f"\nNo regressions beyond {tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline at several dataset sizes")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="dataset sizes in rows")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help="timed runs per stage (the best is kept)")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the extra tracemalloc run per stage")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown or growth relative to the baseline (0.25 = 25%%)")
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="store this run as the new baseline")
+    args = parser.parse_args()
+    sys.exit(main(sizes=args.sizes, repeats=args.repeats, memory=not args.no_memory, tolerance=args.tolerance,
+                  baseline_file=args.baseline, save_baseline=args.save_baseline))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Linear-time cluster validity criteria for the k-sweep
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Calinski-Harabasz, Davies-Bouldin and inertia only need each point's
+distance to its own centroid plus the k x k centroid geometry, so they
+cost O(N * d) instead of silhouette's O(N^2). This makes k selectable on
+the full dataset, with silhouette kept as an optional extra.
+"""
+
+import numpy as np
+from scipy import sparse
+
+SELECTION_CRITERIA = ('silhouette', 'calinski_harabasz', 'davies_bouldin', 'elbow')
+
+
+def cluster_means(X, labels, n_clusters):
+    """Per-cluster means via one sparse indicator product"""
+    counts = np.bincount(labels, minlength=n_clusters)
+    indicator = sparse.csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))),
+                                  shape=(n_clusters, len(labels)))
+    sums = np.asarray((indicator @ X).todense() if sparse.issparse(X) else indicator @ X)
+    return sums / np.maximum(counts, 1)[:, None], counts
+
+
+def own_centroid_sq_distances(X, labels, centers):
+    """Squared distance from every point to its own centroid"""
+    if sparse.issparse(X):
+        row_sq = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    else:
+        row_sq = np.einsum('ij,ij->i', X, X)
+    cross = np.asarray(X @ centers.T)[np.arange(X.shape[0]), labels]
+    center_sq = (centers ** 2).sum(axis=1)[labels]
+    return np.maximum(row_sq - 2 * cross + center_sq, 0.0)
+
+
+def validity_scores(X, labels):
+    """Inertia, Calinski-Harabasz and Davies-Bouldin for one clustering"""
+    labels = np.asarray(labels)
+    n_samples = X.shape[0]
+    n_clusters = int(labels.max()) + 1
+    centers, counts = cluster_means(X, labels, n_clusters)
+
+    sq_distances = own_centroid_sq_distances(X, labels, centers)
+    within = float(sq_distances.sum())
+
+    overall_mean = np.asarray(X.mean(axis=0)).ravel()
+    between = float((counts * ((centers - overall_mean) ** 2).sum(axis=1)).sum())
+    if n_clusters > 1 and within > 0:
+        calinski_harabasz = between * (n_samples - n_clusters) / (within * (n_clusters - 1))
+    else:
+        calinski_harabasz = 1.0
+
+    # Davies-Bouldin: mean over clusters of the worst (S_i + S_j) / M_ij ratio
+    scatter = np.bincount(labels, weights=np.sqrt(sq_distances), minlength=n_clusters) / np.maximum(counts, 1)
+    separation = np.sqrt(((centers[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = (scatter[:, None] + scatter[None, :]) / separation
+    ratios[~np.isfinite(ratios)] = 0.0
+    np.fill_diagonal(ratios, 0.0)
+    davies_bouldin = float(ratios.max(axis=1).mean()) if n_clusters > 1 else 0.0
+
+    return {
+        'inertia': within,
+        'calinski_harabasz': float(calinski_harabasz),
+        'davies_bouldin': davies_bouldin
+    }
+
+
+def elbow_k(k_values, inertias):
+    """Pick the elbow: the point furthest below the first-to-last chord"""
+    k_values = np.asarray(k_values, dtype=np.float64)
+    inertias = np.asarray(inertias, dtype=np.float64)
+    if len(k_values) < 3:
+        return int(k_values[0])
+
+    x = (k_values - k_values[0]) / (k_values[-1] - k_values[0])
+    span = inertias[0] - inertias[-1]
+    y = (inertias - inertias[-1]) / span if span else np.zeros_like(inertias)
+    return int(k_values[np.argmax((1 - x) - y)])
+
+
+def select_k(results, criterion='silhouette'):
+    """Choose k from sweep results with the configured criterion"""
+    if criterion not in SELECTION_CRITERIA:
+        raise ValueError(f"Unknown criterion '{criterion}', expected one of {SELECTION_CRITERIA}")
+
+    k_values = [result['k'] for result in results]
+    if criterion == 'elbow':
+        return elbow_k(k_values, [result['inertia'] for result in results])
+    scores = [result[criterion] for result in results]
+    if any(score is None for score in scores):
+        raise ValueError(f"Sweep results have no '{criterion}' scores")
+    best = np.argmin(scores) if criterion == 'davies_bouldin' else np.argmax(scores)
+    return k_values[best]
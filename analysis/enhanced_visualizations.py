@@ -4,6 +4,7 @@ Enhanced Data Visualizations for Canadian Music DNA
 Advanced charts with interactive features, modern design, and better insights
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -17,14 +18,19 @@ import json
 import warnings
 warnings.filterwarnings('ignore')
 
+from stage_trace import StageTrace
+from survey_cache import load_survey_data
+from term_matrix import WORD_CLOUD_EXCLUDED_TERMS
+from token_cache import cached_term_matrix, open_ended_responses
+
 # Set up modern plotting style
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
+
 def load_data():
     """Load the music survey data"""
-    data_path = Path(__file__).parent.parent.parent / "vanai-hackathon-004-master" / "data" / "raw" / "music_survey_data.csv"
-    return pd.read_csv(data_path)
+    return load_survey_data()
 
 def create_modern_color_palette():
     """Create a modern, accessible color palette"""
@@ -280,7 +286,7 @@ def create_ai_attitudes_timeline(df):
         return None
     
     # Analyze AI attitudes by age group
-    ai_by_age = df.groupby('AgeGroup_Broad')['Q10_Songs_by_AI'].value_counts().unstack(fill_value=0)
+    ai_by_age = df.groupby('AgeGroup_Broad', observed=True)['Q10_Songs_by_AI'].value_counts().unstack(fill_value=0)
     
     # Calculate percentages
     ai_percentages = ai_by_age.div(ai_by_age.sum(axis=1), axis=0) * 100
@@ -339,7 +345,7 @@ def create_music_discovery_sunburst(df):
         return None
     
     # Analyze discovery methods by age group
-    discovery_data = df.groupby(['AgeGroup_Broad', 'Q2_Discovering_music']).size().reset_index(name='count')
+    discovery_data = df.groupby(['AgeGroup_Broad', 'Q2_Discovering_music'], observed=True).size().reset_index(name='count')
     
     # Create hierarchical data for sunburst
     ids = []
@@ -412,32 +418,18 @@ def create_sentiment_word_cloud(df):
         return None
     
     # Get text data
-    theme_songs = df[theme_song_col].dropna()
-    theme_songs = theme_songs[theme_songs != "Not sure"]
+    theme_songs = open_ended_responses(df, theme_song_col)
     
     if len(theme_songs) == 0:
         print("   ⚠️ No theme song data available")
         return None
     
-    # Combine all text
-    all_text = ' '.join(theme_songs.astype(str))
-    
-    # Simple word frequency analysis
-    import re
-    from collections import Counter
-    
-    # Clean text
-    words = re.findall(r'\b\w+\b', all_text.lower())
-    
-    # Remove common stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their', 'not', 'sure'}
-    
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 2]
-    word_freq = Counter(filtered_words)
+    # Word frequencies from the shared token cache (tokenized once per data version)
+    word_freq = cached_term_matrix(theme_songs, theme_song_col).top_terms(50, exclude=WORD_CLOUD_EXCLUDED_TERMS)
     
     # Create word cloud data
     words_data = []
-    for word, freq in word_freq.most_common(50):
+    for word, freq in word_freq.items():
         words_data.append({
             'word': word,
             'frequency': freq,
@@ -523,7 +515,7 @@ def create_enhanced_dashboard(df, personas_data=None):
     
     # 2. AI Attitudes by Age (Bar Chart)
     if 'Q10_Songs_by_AI' in df.columns and 'AgeGroup_Broad' in df.columns:
-        ai_by_age = df.groupby('AgeGroup_Broad')['Q10_Songs_by_AI'].value_counts().unstack(fill_value=0)
+        ai_by_age = df.groupby('AgeGroup_Broad', observed=True)['Q10_Songs_by_AI'].value_counts().unstack(fill_value=0)
         for i, response in enumerate(ai_by_age.columns):
             fig.add_trace(
                 go.Bar(
@@ -646,13 +638,16 @@ def export_all_visualizations():
     
     print(f"   ✅ Static images directory created: {output_dir}")
 
-def main():
+def main(trace_file=None):
     """Main visualization pipeline"""
     print("🎨 Enhanced Data Visualizations for Canadian Music DNA")
     print("="*70)
+    trace = StageTrace('enhanced_visualizations')
     
     # Load data
-    df = load_data()
+    with trace.stage('load') as stage:
+        df = load_data()
+        stage['rows'] = n_rows = len(df)
     print(f"✅ Dataset loaded: {len(df)} responses")
     
     # Load personas data if available
@@ -668,28 +663,36 @@ def main():
     
     # 1. Interactive Persona Radar Chart
     if personas_data:
-        create_interactive_persona_radar_chart(personas_data)
+        with trace.stage('persona_radar', personas=len(personas_data)):
+            create_interactive_persona_radar_chart(personas_data)
     
     # 2. Sankey Format Evolution
-    create_sankey_format_evolution(df)
+    with trace.stage('format_sankey', rows=n_rows):
+        create_sankey_format_evolution(df)
     
     # 3. Demographics Heatmap
-    create_heatmap_demographics(df)
+    with trace.stage('demographics_heatmap', rows=n_rows):
+        create_heatmap_demographics(df)
     
     # 4. AI Attitudes Timeline
-    create_ai_attitudes_timeline(df)
+    with trace.stage('ai_attitudes_timeline', rows=n_rows):
+        create_ai_attitudes_timeline(df)
     
     # 5. Music Discovery Sunburst
-    create_music_discovery_sunburst(df)
+    with trace.stage('discovery_sunburst', rows=n_rows):
+        create_music_discovery_sunburst(df)
     
     # 6. Sentiment Word Cloud
-    create_sentiment_word_cloud(df)
+    with trace.stage('sentiment_word_cloud', rows=n_rows):
+        create_sentiment_word_cloud(df)
     
     # 7. Enhanced Dashboard
-    create_enhanced_dashboard(df, personas_data)
+    with trace.stage('dashboard', rows=n_rows):
+        create_enhanced_dashboard(df, personas_data)
     
     # Export static fallbacks
-    export_all_visualizations()
+    with trace.stage('static_exports'):
+        export_all_visualizations()
     
     print("\n" + "="*70)
     print("✅ Enhanced visualizations complete!")
@@ -708,6 +711,13 @@ def main():
     print("   4. Implement chart export functionality")
     print("   5. Add accessibility features")
     print("="*70)
+    
+    trace.summary()
+    print(f"   Stage trace written to: {trace.write(trace_file)}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Canadian Music DNA enhanced visualizations")
+    parser.add_argument('--trace', type=Path, default=None,
+                        help="where to write the per-stage Chrome trace (default data/traces/)")
+    args = parser.parse_args()
+    main(trace_file=args.trace)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Sparse one-hot feature store for persona clustering
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Encodes the clustering questions as a CSR matrix with the same column
+layout as pd.get_dummies (features in order, categories sorted) and keeps
+the category vocabulary next to it, so new respondents can be encoded the
+same way. Stores are plain .npy arrays plus a JSON vocabulary and are
+memory-mapped on load.
+
+build_feature_store writes a store from a survey read in chunks: one pass
+collects the vocabulary, a second encodes each chunk and writes its rows
+straight into the memory-mapped arrays, so neither the survey nor the
+matrix is ever held in memory whole.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+FEATURE_STORE_DIR = Path(__file__).parent.parent / "data" / "cache" / "features"
+MISSING_CATEGORY = 'Unknown'
+
+
+def build_vocabulary(df, columns):
+    """Collect the sorted answer categories for each feature column"""
+    vocabulary = {}
+    for column in columns:
+        series = df[column]
+        categories = {str(value) for value in pd.unique(series.dropna())}
+        if series.isna().any():
+            categories.add(MISSING_CATEGORY)
+        vocabulary[column] = sorted(categories)
+    return vocabulary
+
+
+def merge_vocabularies(vocabularies):
+    """Union of per-chunk vocabularies, categories sorted as in build_vocabulary"""
+    merged = {}
+    for vocabulary in vocabularies:
+        for column, categories in vocabulary.items():
+            merged.setdefault(column, set()).update(categories)
+    return {column: sorted(categories) for column, categories in merged.items()}
+
+
+def encode_codes(df, vocabulary):
+    """Integer-code each feature column against the vocabulary (-1 = unseen)"""
+    codes = np.empty((len(df), len(vocabulary)), dtype=np.int32)
+    for j, (column, categories) in enumerate(vocabulary.items()):
+        series = df[column]
+        column_codes = pd.Categorical(series, categories=categories).codes.astype(np.int32)
+        if MISSING_CATEGORY in categories:
+            column_codes[series.isna().to_numpy()] = categories.index(MISSING_CATEGORY)
+        codes[:, j] = column_codes
+    return codes
+
+
+def codes_to_csr(codes, vocabulary, dtype=np.float64):
+    """Expand integer codes into a one-hot CSR matrix"""
+    sizes = np.array([len(categories) for categories in vocabulary.values()], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    n_columns = int(sizes.sum())
+
+    valid = codes >= 0
+    index_dtype = np.int32 if max(valid.sum(), n_columns) < np.iinfo(np.int32).max else np.int64
+    indices = (codes + offsets)[valid].astype(index_dtype)
+    indptr = np.zeros(len(codes) + 1, dtype=index_dtype)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    data = np.ones(len(indices), dtype=dtype)
+
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(codes), n_columns))
+
+
+def encode_features(df, columns, vocabulary=None, dtype=np.float64):
+    """One-hot encode feature columns into CSR, building the vocabulary if needed"""
+    if vocabulary is None:
+        vocabulary = build_vocabulary(df, columns)
+    codes = encode_codes(df, vocabulary)
+    return codes_to_csr(codes, vocabulary, dtype=dtype), vocabulary
+
+
+def vocabulary_columns(vocabulary):
+    """Column names matching pd.get_dummies for a vocabulary"""
+    return [f"{column}_{category}" for column, categories in vocabulary.items() for category in categories]
+
+
+def save_vocabulary(vocabulary, shape, store_dir=FEATURE_STORE_DIR):
+    """Write a store's vocabulary and matrix shape"""
+    with open(Path(store_dir) / "vocabulary.json", 'w', encoding='utf-8') as f:
+        json.dump({'shape': list(shape), 'vocabulary': vocabulary}, f, ensure_ascii=False)
+
+
+def save_feature_store(X, vocabulary, store_dir=FEATURE_STORE_DIR):
+    """Write a CSR matrix and its vocabulary as memory-mappable arrays"""
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    X = sparse.csr_matrix(X)
+    np.save(store_dir / "data.npy", X.data)
+    np.save(store_dir / "indices.npy", X.indices)
+    np.save(store_dir / "indptr.npy", X.indptr)
+    save_vocabulary(vocabulary, X.shape, store_dir)
+    return store_dir
+
+
+def build_feature_store(read_chunks, columns, store_dir=FEATURE_STORE_DIR, dtype=np.float64):
+    """Encode feature columns into a stored CSR matrix from a survey read in chunks
+
+    read_chunks() returns a fresh iterator of DataFrame chunks; it is called twice.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    # Pass 1: vocabulary and row count
+    n_rows = 0
+    vocabularies = []
+    for chunk in read_chunks():
+        vocabularies.append(build_vocabulary(chunk, columns))
+        n_rows += len(chunk)
+    vocabulary = merge_vocabularies(vocabularies)
+    n_columns = sum(len(categories) for categories in vocabulary.values())
+
+    # Every answer (or Unknown) is in the vocabulary, so each row has one entry per question
+    max_nnz = n_rows * len(columns)
+    index_dtype = np.int32 if max(max_nnz, n_columns) < np.iinfo(np.int32).max else np.int64
+    data = np.lib.format.open_memmap(store_dir / "data.npy", mode='w+', dtype=dtype, shape=(max_nnz,))
+    indices = np.lib.format.open_memmap(store_dir / "indices.npy", mode='w+', dtype=index_dtype, shape=(max_nnz,))
+    indptr = np.lib.format.open_memmap(store_dir / "indptr.npy", mode='w+', dtype=index_dtype, shape=(n_rows + 1,))
+
+    # Pass 2: encode each chunk and write its rows in place
+    indptr[0] = 0
+    row = nnz = 0
+    for chunk in read_chunks():
+        block = codes_to_csr(encode_codes(chunk, vocabulary), vocabulary, dtype=dtype)
+        data[nnz:nnz + block.nnz] = block.data
+        indices[nnz:nnz + block.nnz] = block.indices
+        indptr[row + 1:row + 1 + block.shape[0]] = block.indptr[1:] + nnz
+        row += block.shape[0]
+        nnz += block.nnz
+    if row != n_rows or nnz != max_nnz:
+        raise ValueError(f"Survey changed while building the feature store ({n_rows} rows, then {row})")
+    for array in (data, indices, indptr):
+        array.flush()
+    del data, indices, indptr
+
+    save_vocabulary(vocabulary, (n_rows, n_columns), store_dir)
+    return store_dir
+
+
+def load_vocabulary(store_dir=FEATURE_STORE_DIR):
+    """Read the stored vocabulary and matrix shape"""
+    with open(Path(store_dir) / "vocabulary.json", 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return meta['vocabulary'], tuple(meta['shape'])
+
+
+def load_feature_store(store_dir=FEATURE_STORE_DIR, mmap=True):
+    """Load a stored CSR matrix (memory-mapped by default) and its vocabulary"""
+    store_dir = Path(store_dir)
+    mmap_mode = 'r' if mmap else None
+    vocabulary, shape = load_vocabulary(store_dir)
+
+    data = np.load(store_dir / "data.npy", mmap_mode=mmap_mode)
+    indices = np.load(store_dir / "indices.npy", mmap_mode=mmap_mode)
+    indptr = np.load(store_dir / "indptr.npy", mmap_mode=mmap_mode)
+
+    X = sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+    return X, vocabulary
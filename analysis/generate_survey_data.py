@@ -3,49 +3,141 @@
 Generate survey data JSON for frontend charts
 """
 
+import argparse
+import numpy as np
 import pandas as pd
 import json
 from pathlib import Path
 
-def generate_survey_data():
-    """Generate survey data JSON from the real dataset"""
+from stage_trace import StageTrace
+from survey_cache import RAW_DATA_PATH, load_survey_data
+
+# Columns whose full answer distribution goes into survey_data.json
+COUNTED_COLUMNS = [
+    'AgeGroup_Broad',
+    'Province',
+    'Gender',
+    'Education',
+    'Q1_Relationship_with_music',
+    'Q2_Discovering_music',
+    'Q10_Songs_by_AI',
+    'Q4_Music_format_changes'
+]
+LISTENING_GRID_PREFIX = 'Q8_Music_listen_time_GRID'
+FREQUENT_LISTENING = ['Often', 'Always']
+
+def factorize_counts(series):
+    """Factorize a column once and count every answer with a single bincount"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Cached columns already carry codes in first-seen category order
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return uniques, counts
+
+def count_survey_answers(df):
+    """Count answers for one frame (a whole dataset or a single chunk)"""
+    # Factorize order is first-seen order, which the merge relies on for ties
+    counts = {}
+    for col in COUNTED_COLUMNS:
+        uniques, col_counts = factorize_counts(df[col])
+        counts[col] = dict(zip(uniques, col_counts.tolist()))
+    
+    # Count "Often" and "Always" responses for each grid question
+    listening_habits = {}
+    for col in df.columns:
+        if LISTENING_GRID_PREFIX in col:
+            uniques, col_counts = factorize_counts(df[col])
+            frequent = np.isin(np.asarray(uniques, dtype=object), FREQUENT_LISTENING)
+            listening_habits[col] = int(col_counts[frequent].sum())
+    
+    return {
+        'total_responses': int(len(df)),
+        'counts': counts,
+        'listening_habits': listening_habits
+    }
+
+def merge_survey_counts(totals, partial):
+    """Add one chunk's counts into the running totals"""
+    if totals is None:
+        totals = {'total_responses': 0, 'counts': {col: {} for col in COUNTED_COLUMNS}, 'listening_habits': {}}
+    
+    totals['total_responses'] += partial['total_responses']
+    for col, col_counts in partial['counts'].items():
+        running = totals['counts'][col]
+        for answer, count in col_counts.items():
+            running[answer] = running.get(answer, 0) + int(count)
+    for col, count in partial['listening_habits'].items():
+        totals['listening_habits'][col] = totals['listening_habits'].get(col, 0) + count
+    
+    return totals
+
+def sorted_counts(counts):
+    """Order answer counts like value_counts: most common first, ties in first-seen order"""
+    ordered = sorted(((answer, count) for answer, count in counts.items() if count > 0),
+                     key=lambda item: -item[1])
+    return {answer: int(count) for answer, count in ordered}
+
+def stream_survey_counts(data_path, chunksize):
+    """Count answers by reading the raw CSV in fixed-size chunks"""
+    needed = set(COUNTED_COLUMNS)
+    reader = pd.read_csv(
+        data_path,
+        usecols=lambda col: col in needed or LISTENING_GRID_PREFIX in col,
+        chunksize=chunksize
+    )
+    
+    totals = None
+    for chunk in reader:
+        totals = merge_survey_counts(totals, count_survey_answers(chunk))
+    return totals
+
+def generate_survey_data(data_path=None, chunksize=None, output_dir=None, trace=None):
+    """Generate survey data JSON from the real dataset (stages recorded on trace if given)"""
     print("Generating survey data...")
+    trace = trace or StageTrace('generate_survey_data', enabled=False)
+    
+    with trace.stage('count') as stage:
+        if chunksize:
+            # Streaming mode: bounded memory, reads the raw CSV directly
+            print(f"Streaming raw CSV in chunks of {chunksize} rows")
+            totals = stream_survey_counts(data_path or RAW_DATA_PATH, chunksize)
+        else:
+            # Load the dataset
+            df = load_survey_data(data_path)
+            totals = merge_survey_counts(None, count_survey_answers(df))
+        stage['rows'] = totals['total_responses']
     
-    # Load the dataset
-    data_path = Path(__file__).parent.parent.parent / "vanai-hackathon-004-master" / "data" / "raw" / "music_survey_data.csv"
-    df = pd.read_csv(data_path)
+    counts = {col: sorted_counts(col_counts) for col, col_counts in totals['counts'].items()}
     
     # Calculate demographics
     demographics = {
-        'age_groups': df['AgeGroup_Broad'].value_counts().to_dict(),
-        'provinces': df['Province'].value_counts().to_dict(),
-        'gender': df['Gender'].value_counts().to_dict(),
-        'education': df['Education'].value_counts().to_dict()
+        'age_groups': counts['AgeGroup_Broad'],
+        'provinces': counts['Province'],
+        'gender': counts['Gender'],
+        'education': counts['Education']
     }
     
     # Calculate music relationship distribution
-    music_relationship = df['Q1_Relationship_with_music'].value_counts().to_dict()
+    music_relationship = counts['Q1_Relationship_with_music']
     
     # Calculate discovery methods distribution
-    discovery_methods = df['Q2_Discovering_music'].value_counts().to_dict()
+    discovery_methods = counts['Q2_Discovering_music']
     
     # Calculate AI attitudes distribution
-    ai_attitudes = df['Q10_Songs_by_AI'].value_counts().to_dict()
+    ai_attitudes = counts['Q10_Songs_by_AI']
     
     # Calculate listening habits (from grid questions)
-    listening_habits = {}
-    for col in df.columns:
-        if 'Q8_Music_listen_time_GRID' in col:
-            # Count "Often" and "Always" responses
-            often_always = df[col].isin(['Often', 'Always']).sum()
-            listening_habits[col] = int(often_always)
+    listening_habits = totals['listening_habits']
     
     # Calculate format evolution (from Q4)
-    format_evolution = df['Q4_Music_format_changes'].value_counts().to_dict()
+    format_evolution = counts['Q4_Music_format_changes']
     
     # Create survey data structure
     survey_data = {
-        'total_responses': int(len(df)),
+        'total_responses': totals['total_responses'],
         'demographics': demographics,
         'music_relationship': music_relationship,
         'discovery_methods': discovery_methods,
@@ -55,19 +147,31 @@ def generate_survey_data():
     }
     
     # Export to JSON
-    output_dir = Path(__file__).parent.parent / "data" / "processed"
+    output_dir = Path(output_dir or Path(__file__).parent.parent / "data" / "processed")
     output_dir.mkdir(parents=True, exist_ok=True)
     
     survey_file = output_dir / "survey_data.json"
-    with open(survey_file, 'w', encoding='utf-8') as f:
-        json.dump(survey_data, f, indent=2, ensure_ascii=False)
+    with trace.stage('export'):
+        with open(survey_file, 'w', encoding='utf-8') as f:
+            json.dump(survey_data, f, indent=2, ensure_ascii=False)
     
     print(f"Survey data exported to: {survey_file}")
-    print(f"Total responses: {len(df)}")
+    print(f"Total responses: {survey_data['total_responses']}")
     print(f"Age groups: {len(demographics['age_groups'])}")
     print(f"Provinces: {len(demographics['provinces'])}")
     print(f"Discovery methods: {len(discovery_methods)}")
     print(f"AI attitudes: {len(ai_attitudes)}")
 
 if __name__ == "__main__":
-    generate_survey_data()
+    parser = argparse.ArgumentParser(description="Generate survey_data.json for the frontend charts")
+    parser.add_argument('--input', type=Path, default=None,
+                        help="raw survey CSV (defaults to music_survey_data.csv)")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream the raw CSV in chunks of this many rows")
+    parser.add_argument('--trace', type=Path, default=None,
+                        help="where to write the per-stage Chrome trace (default data/traces/)")
+    args = parser.parse_args()
+    trace = StageTrace('generate_survey_data')
+    generate_survey_data(data_path=args.input, chunksize=args.chunksize, trace=trace)
+    trace.summary()
+    print(f"Stage trace written to: {trace.write(args.trace)}")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+k-modes clustering on integer-coded survey answers
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Every clustering feature is a categorical answer, so instead of one-hot
+encoding, scaling and running Euclidean KMeans, k-modes clusters the
+integer codes from feature_store.encode_codes directly:
+
+- the dissimilarity between two respondents is the number of questions
+  they answered differently (matching dissimilarity);
+- a persona centre is the most common answer to each question (its mode).
+
+Assignment compares codes one question at a time over row blocks, and the
+update step is one bincount per question, so a respondent costs one small
+integer per question rather than a float per one-hot column.
+
+Euclidean distance between one-hot rows is sqrt(2 x matching
+dissimilarity), so codes_to_onehot lets silhouette and the other
+validity criteria score k-modes solutions unchanged.
+"""
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_BLOCK_SIZE = 65536
+
+
+def as_codes(X):
+    """Integer code matrix (respondents x questions) from an array or DataFrame"""
+    if hasattr(X, 'to_numpy'):
+        X = X.to_numpy()
+    return np.ascontiguousarray(np.asarray(X), dtype=np.int32)
+
+
+def codes_to_onehot(codes):
+    """One-hot CSR matrix for a code matrix (unseen codes get no column)"""
+    codes = as_codes(codes)
+    sizes = codes.max(axis=0).astype(np.int64) + 1
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    valid = codes >= 0
+    indptr = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    indices = (codes + offsets)[valid]
+    return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(codes), int(sizes.sum())))
+
+
+def assign_modes(codes, modes, block_size=DEFAULT_BLOCK_SIZE):
+    """Nearest mode and its matching dissimilarity for every respondent"""
+    n_samples = len(codes)
+    labels = np.empty(n_samples, dtype=np.int32)
+    distances = np.empty(n_samples, dtype=np.int32)
+    for start in range(0, n_samples, block_size):
+        block = codes[start:start + block_size]
+        mismatches = np.zeros((len(block), len(modes)), dtype=np.int32)
+        for j in range(codes.shape[1]):
+            mismatches += block[:, j, None] != modes[None, :, j]
+        labels[start:start + len(block)] = mismatches.argmin(axis=1)
+        distances[start:start + len(block)] = mismatches.min(axis=1)
+    return labels, distances
+
+
+def update_modes(codes, labels, n_clusters, n_categories):
+    """Most common answer to each question within each cluster"""
+    modes = np.empty((n_clusters, codes.shape[1]), dtype=np.int32)
+    valid = codes >= 0
+    for j, n_answers in enumerate(n_categories):
+        cells = labels[valid[:, j]].astype(np.int64) * n_answers + codes[valid[:, j], j]
+        counts = np.bincount(cells, minlength=n_clusters * n_answers).reshape(n_clusters, n_answers)
+        modes[:, j] = counts.argmax(axis=1)
+    return modes
+
+
+def init_modes(codes, n_clusters, rng):
+    """Spread initial modes apart, k-means++ style, under matching dissimilarity"""
+    modes = [codes[rng.integers(len(codes))]]
+    nearest = assign_modes(codes, np.array(modes))[1].astype(np.float64)
+    for _ in range(1, n_clusters):
+        weights = nearest ** 2
+        total = weights.sum()
+        row = rng.choice(len(codes), p=weights / total) if total > 0 else rng.integers(len(codes))
+        modes.append(codes[row])
+        nearest = np.minimum(nearest, assign_modes(codes, np.array(modes[-1:]))[1])
+    return np.array(modes, dtype=np.int32)
+
+
+def run_kmodes(codes, modes, n_categories, max_iter=100, block_size=DEFAULT_BLOCK_SIZE):
+    """Alternate assignment and mode updates until the labels stop changing"""
+    n_clusters = len(modes)
+    labels, distances = assign_modes(codes, modes, block_size)
+    for n_iter in range(1, max_iter + 1):
+        modes = update_modes(codes, labels, n_clusters, n_categories)
+    
+        # Re-seed empty clusters with the respondents furthest from their modes
+        empty = np.flatnonzero(np.bincount(labels, minlength=n_clusters) == 0)
+        if len(empty):
+            modes[empty] = codes[np.argsort(-distances, kind='stable')[:len(empty)]]
+    
+        new_labels, distances = assign_modes(codes, modes, block_size)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return modes, labels, int(distances.sum(dtype=np.int64)), n_iter
+
+
+class KModes:
+    """k-modes estimator with the KMeans attributes the pipeline relies on
+    
+    cluster_centers_ holds one answer code per question for each persona and
+    inertia_ is the total matching dissimilarity to the assigned modes.
+    """
+    
+    def __init__(self, n_clusters=8, n_init=10, max_iter=100, random_state=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.n_clusters = n_clusters
+        self.n_init = n_init
+        self.max_iter = max_iter
+        self.random_state = random_state
+        self.block_size = block_size
+    
+    def fit(self, X):
+        """Fit modes on integer codes, keeping the best of n_init restarts"""
+        codes = as_codes(X)
+        n_categories = codes.max(axis=0).astype(np.int64) + 1
+        rng = np.random.default_rng(self.random_state)
+    
+        best = None
+        for _ in range(self.n_init):
+            modes = init_modes(codes, self.n_clusters, rng)
+            run = run_kmodes(codes, modes, n_categories, self.max_iter, self.block_size)
+            if best is None or run[2] < best[2]:
+                best = run
+    
+        self.cluster_centers_, self.labels_, self.inertia_, self.n_iter_ = best
+        return self
+    
+    def predict(self, X):
+        """Nearest persona mode for each respondent"""
+        return assign_modes(as_codes(X), self.cluster_centers_, self.block_size)[0]
+    
+    def fit_predict(self, X):
+        """Fit and return the training labels"""
+        return self.fit(X).labels_
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Streaming MiniBatch KMeans training for persona clustering
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Fits persona centroids on feature matrices larger than RAM. The matrix is
+usually the memory-mapped CSR feature store, and it is only ever touched
+in contiguous row blocks:
+
+1. a random holdout sample is set aside for evaluation;
+2. one pass accumulates the scaler statistics (StandardScaler.partial_fit);
+3. a few epochs feed shuffled blocks to MiniBatchKMeans.partial_fit;
+4. one last pass labels every respondent and records its centroid distance.
+
+Holdout inertia per respondent and holdout silhouette make the fit
+comparable with the full-batch KMeans run. The k-sweep for minibatch
+training fits every candidate k the same way and scores it on the same
+holdout sample, so it never loads the whole matrix either.
+"""
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from cluster_sweep import as_float_matrix
+from cluster_validity import own_centroid_sq_distances, validity_scores
+from silhouette import DEFAULT_SAMPLE_SIZE, silhouette_report
+
+DEFAULT_BATCH_SIZE = 4096
+DEFAULT_MAX_EPOCHS = 5
+DEFAULT_HOLDOUT_SIZE = 10000
+CENTER_SHIFT_TOL = 1e-4
+
+
+def row_blocks(n_rows, batch_size):
+    """Contiguous (start, stop) row blocks covering a matrix"""
+    return [(start, min(start + batch_size, n_rows)) for start in range(0, n_rows, batch_size)]
+
+
+def read_block(X, start, stop, keep=None):
+    """Read one row block from a (possibly memory-mapped) matrix as floats"""
+    block = X[start:stop]
+    if keep is not None:
+        block = block[keep[start:stop]]
+    return as_float_matrix(block)
+
+
+def fit_scaler_streaming(X, batch_size=DEFAULT_BATCH_SIZE, keep=None):
+    """Accumulate scaler statistics block by block"""
+    scaler = StandardScaler(with_mean=not sparse.issparse(X))
+    for start, stop in row_blocks(X.shape[0], batch_size):
+        block = read_block(X, start, stop, keep)
+        if block.shape[0]:
+            scaler.partial_fit(block)
+    return scaler
+
+
+def predict_streaming(X, model, scaler, batch_size=DEFAULT_BATCH_SIZE):
+    """Label every row and measure its centroid distance, block by block"""
+    labels = np.empty(X.shape[0], dtype=np.int32)
+    distances = np.empty(X.shape[0], dtype=np.float32)
+    for start, stop in row_blocks(X.shape[0], batch_size):
+        block = scaler.transform(read_block(X, start, stop))
+        labels[start:stop] = model.predict(block)
+        distances[start:stop] = np.sqrt(own_centroid_sq_distances(block, labels[start:stop], model.cluster_centers_))
+    return labels, distances
+
+
+def holdout_split(n_rows, holdout_size, rng):
+    """Random holdout rows (sorted) and the mask of the rows left for training"""
+    holdout_rows = np.sort(rng.choice(n_rows, size=min(holdout_size, n_rows // 5), replace=False))
+    train_mask = np.ones(n_rows, dtype=bool)
+    train_mask[holdout_rows] = False
+    return holdout_rows, train_mask
+
+
+def fit_minibatch(X, k, scaler, train_mask, rng, batch_size=DEFAULT_BATCH_SIZE, max_epochs=DEFAULT_MAX_EPOCHS,
+                  random_state=42):
+    """Feed shuffled training blocks to MiniBatchKMeans until the centroids settle"""
+    # n_init only applies to the first partial_fit, which seeds the centroids
+    model = MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=batch_size, n_init=3)
+    blocks = row_blocks(X.shape[0], batch_size)
+    for epoch in range(max_epochs):
+        previous = None if epoch == 0 else model.cluster_centers_.copy()
+        for block_id in rng.permutation(len(blocks)):
+            start, stop = blocks[block_id]
+            block = read_block(X, start, stop, keep=train_mask)
+            if block.shape[0] >= k:
+                model.partial_fit(scaler.transform(block))
+    
+        if previous is not None:
+            shift = np.sqrt(((model.cluster_centers_ - previous) ** 2).sum(axis=1)).max()
+            print(f"   Epoch {epoch + 1}: max centroid shift {shift:.5f}")
+            if shift < CENTER_SHIFT_TOL:
+                break
+    return model
+
+
+def train_minibatch_kmeans(X, k, batch_size=DEFAULT_BATCH_SIZE, max_epochs=DEFAULT_MAX_EPOCHS,
+                           holdout_size=DEFAULT_HOLDOUT_SIZE, random_state=42):
+    """Fit MiniBatch KMeans from streamed row blocks and evaluate on a holdout sample"""
+    if hasattr(X, 'to_numpy'):
+        X = X.to_numpy()
+    rng = np.random.default_rng(random_state)
+    
+    # Hold out a random sample for evaluation; train on everything else
+    holdout_rows, train_mask = holdout_split(X.shape[0], holdout_size, rng)
+    scaler = fit_scaler_streaming(X, batch_size, keep=train_mask)
+    model = fit_minibatch(X, k, scaler, train_mask, rng, batch_size, max_epochs, random_state)
+    
+    labels, distances = predict_streaming(X, model, scaler, batch_size)
+    
+    # Holdout quality: mean squared distance to the nearest centroid and silhouette
+    X_holdout = scaler.transform(as_float_matrix(X[holdout_rows]))
+    holdout_labels = labels[holdout_rows]
+    report = silhouette_report(X_holdout, holdout_labels, mode='exact')
+    report['rows'] = holdout_rows[report['rows']]
+    metrics = {
+        'holdout_size': int(len(holdout_rows)),
+        'holdout_inertia_per_respondent': float(-model.score(X_holdout) / max(len(holdout_rows), 1)),
+        'holdout_silhouette': report
+    }
+    return model, scaler, labels, distances, metrics
+
+
+def sweep_k_minibatch(X, k_range, batch_size=DEFAULT_BATCH_SIZE, max_epochs=DEFAULT_MAX_EPOCHS,
+                      holdout_size=DEFAULT_HOLDOUT_SIZE, random_state=42, silhouette_mode='exact',
+                      sample_size=DEFAULT_SAMPLE_SIZE):
+    """Fit MiniBatch KMeans for every k in k_range and score each on the holdout sample
+    
+    Each k is trained exactly as train_minibatch_kmeans would train it; results
+    have the same keys as cluster_sweep.sweep_k (silhouette_mode=None skips silhouette).
+    """
+    if hasattr(X, 'to_numpy'):
+        X = X.to_numpy()
+    holdout_rows, train_mask = holdout_split(X.shape[0], holdout_size, np.random.default_rng(random_state))
+    scaler = fit_scaler_streaming(X, batch_size, keep=train_mask)
+    X_holdout = scaler.transform(as_float_matrix(X[holdout_rows]))
+    
+    results = []
+    for k in k_range:
+        print(f"   Fitting k={k}...")
+        # Same random stream as train_minibatch_kmeans: the holdout draw, then the block order
+        rng = np.random.default_rng(random_state)
+        holdout_split(X.shape[0], holdout_size, rng)
+        model = fit_minibatch(X, k, scaler, train_mask, rng, batch_size, max_epochs, random_state)
+    
+        labels = model.predict(X_holdout)
+        scores = validity_scores(X_holdout, labels)
+        result = {
+            'k': k,
+            'silhouette': None,
+            'silhouette_ci': None,
+            'calinski_harabasz': scores['calinski_harabasz'],
+            'davies_bouldin': scores['davies_bouldin'],
+            'inertia': float(-model.score(X_holdout))
+        }
+        if silhouette_mode is not None:
+            report = silhouette_report(X_holdout, labels, mode=silhouette_mode, sample_size=sample_size,
+                                       random_state=random_state)
+            result['silhouette'] = report['mean']
+            result['silhouette_ci'] = (report['ci_low'], report['ci_high'])
+        results.append(result)
+    return results
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Parallel analysis of the open-ended answers
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Splits every open-ended column into shards of consecutive rows and
+analyzes the (column, shard) tasks across a process pool. Each shard
+returns its term matrix, emotional theme counts, response count and first
+sample answers; these are merged per column in shard order, so the result
+is identical to a serial run whatever the number of workers or the order
+in which shards finish.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from cluster_sweep import resolve_jobs
+from term_matrix import build_term_matrix, concat_term_matrices
+
+DEFAULT_SHARD_ROWS = 250000
+SAMPLE_RESPONSES = 10
+
+
+def shard_ranges(n_rows, shard_rows=DEFAULT_SHARD_ROWS):
+    """(start, stop) row ranges covering n_rows"""
+    return [(start, min(start + shard_rows, n_rows)) for start in range(0, n_rows, shard_rows)]
+
+
+def analyze_shard(responses, matcher, tokenize=True):
+    """Term matrix (unless already cached), theme counts and samples of one shard of a column"""
+    return {
+        'total_responses': len(responses),
+        'sample_responses': responses.head(SAMPLE_RESPONSES).tolist(),
+        'terms': build_term_matrix(responses) if tokenize else None,
+        'theme_counts': matcher.counts(responses)
+    }
+
+
+def merge_shards(shards, terms=None):
+    """Combine one column's shard results, in shard order"""
+    samples = [response for shard in shards for response in shard['sample_responses']]
+    return {
+        'total_responses': sum(shard['total_responses'] for shard in shards),
+        'sample_responses': samples[:SAMPLE_RESPONSES],
+        'terms': terms if terms is not None else concat_term_matrices([shard['terms'] for shard in shards]),
+        'theme_counts': [sum(counts) for counts in zip(*(shard['theme_counts'] for shard in shards))]
+    }
+
+
+def analyze_columns(columns, matcher, n_jobs=1, shard_rows=DEFAULT_SHARD_ROWS, terms=None):
+    """Analyze {name: responses} column by column and shard by shard, serially or across a process pool
+    
+    terms holds already tokenized columns ({name: TermMatrix}); their shards skip tokenization.
+    """
+    terms = terms or {}
+    tasks = [(name, start, stop) for name, responses in columns.items()
+             for start, stop in shard_ranges(len(responses), shard_rows)]
+    n_workers = resolve_jobs(n_jobs, len(tasks))
+    
+    if n_workers == 1:
+        results = [analyze_shard(columns[name].iloc[start:stop], matcher, name not in terms)
+                   for name, start, stop in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            # Plain strings pickle smaller than a categorical slice carrying every category
+            futures = [pool.submit(analyze_shard, columns[name].iloc[start:stop].astype(object), matcher,
+                                   name not in terms)
+                       for name, start, stop in tasks]
+            results = [future.result() for future in futures]
+    
+    by_column = {name: [] for name in columns}
+    for (name, _, _), result in zip(tasks, results):
+        by_column[name].append(result)
+    return {name: merge_shards(shards, terms.get(name)) for name, shards in by_column.items() if shards}
@@ -4,49 +4,86 @@ Canadian Music DNA - Persona Clustering Analysis
 Vancouver AI Hackathon Round 4: The Soundtrack of Us
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import silhouette_score
+from scipy.sparse import issparse
 import json
+from functools import partial
 import os
 from pathlib import Path
 
+import cluster_sweep
+import cluster_validity
+import feature_store
+import kmodes
+import minibatch_training
+import persona_profile
+import persona_stability
+import silhouette
+import survey_cache
+from cluster_sweep import sweep_k, sweep_k_warm
+from cluster_validity import SELECTION_CRITERIA, own_centroid_sq_distances, select_k
+from feature_store import (build_feature_store, build_vocabulary, encode_codes, encode_features, load_feature_store,
+                           load_vocabulary, save_feature_store)
+from kmodes import KModes, as_codes, assign_modes, codes_to_onehot
+from minibatch_training import DEFAULT_BATCH_SIZE, sweep_k_minibatch, train_minibatch_kmeans
+from persona_model import save_persona_model
+from persona_profile import build_count_tables, personas_from_tables, save_count_tables
+from persona_stability import DEFAULT_N_RESAMPLES, bootstrap_stability, export_stability
+from pipeline_cache import cached_step
+from silhouette import DEFAULT_SAMPLE_SIZE, SILHOUETTE_MODES, export_silhouette_samples, silhouette_report
+from stage_trace import StageTrace
+from survey_cache import iter_survey_chunks, load_survey_data, survey_data_hash
+from web_bundle import export_web_bundle
+
+# Key features for clustering
+CLUSTERING_FEATURES = {
+    'music_relationship': 'Q1_Relationship_with_music',
+    'discovery_method': 'Q2_Discovering_music',
+    'age_group': 'AgeGroup_Broad',
+    'province': 'Province',
+    'gender': 'Gender',
+    'ai_attitude': 'Q10_Songs_by_AI',
+    'ai_voice_attitude': 'Q11_Use_of_dead_artists_voice_feelings',
+    'music_preference': 'Q9_Music_preference_these_days'
+}
+
 def load_and_prepare_data():
     """Load and prepare the music survey data for clustering"""
     # Load the dataset
-    data_path = Path(__file__).parent.parent.parent / "vanai-hackathon-004-master" / "data" / "raw" / "music_survey_data.csv"
-    
     try:
-        df = pd.read_csv(data_path)
+        df = load_survey_data()
         print(f"Dataset loaded: {len(df)} responses, {len(df.columns)} columns")
         return df
     except Exception as e:
         print(f"Error loading dataset: {e}")
         return None
 
-def feature_engineering(df):
-    """Engineer features for clustering"""
+def feature_engineering(df, sparse=False, codes=False, features=CLUSTERING_FEATURES):
+    """Engineer features for clustering (CSR one-hot when sparse=True, answer codes when codes=True)"""
     print("\nFeature Engineering...")
     
-    # Select key features for clustering
-    features = {
-        'music_relationship': 'Q1_Relationship_with_music',
-        'discovery_method': 'Q2_Discovering_music',
-        'age_group': 'AgeGroup_Broad',
-        'province': 'Province',
-        'gender': 'Gender',
-        'ai_attitude': 'Q10_Songs_by_AI',
-        'ai_voice_attitude': 'Q11_Use_of_dead_artists_voice_feelings',
-        'music_preference': 'Q9_Music_preference_these_days'
-    }
+    if codes:
+        # One integer code per question, clustered directly by k-modes
+        feature_encoded = encode_codes(df, build_vocabulary(df, list(features.values())))
+        print(f"   Features created: {feature_encoded.shape[1]} answer codes ({feature_encoded.nbytes / 1e6:.1f} MB)")
+        return feature_encoded, features
+    
+    if sparse:
+        # Encode straight from the (categorical) columns and persist the store
+        feature_encoded, vocabulary = encode_features(df, list(features.values()))
+        save_feature_store(feature_encoded, vocabulary)
+        print(f"   Features created: {feature_encoded.shape[1]} dimensions (sparse, nnz={feature_encoded.nnz})")
+        return feature_encoded, features
     
     # Create feature dataframe
     feature_df = df[list(features.values())].copy()
     
-    # Handle missing values
-    feature_df = feature_df.fillna('Unknown')
+    # Handle missing values (cached answer columns are categoricals)
+    feature_df = feature_df.astype(object).fillna('Unknown')
     
     # One-hot encode categorical variables
     categorical_cols = feature_df.select_dtypes(include=['object']).columns
@@ -55,89 +92,138 @@ def feature_engineering(df):
     print(f"   Features created: {feature_encoded.shape[1]} dimensions")
     return feature_encoded, features
 
-def find_optimal_clusters(X, max_k=8):
-    """Find optimal number of clusters using silhouette score"""
-    print("\nFinding optimal number of clusters...")
+def find_optimal_clusters(X, max_k=8, n_jobs=1, silhouette_mode='exact', sample_size=DEFAULT_SAMPLE_SIZE,
+                          warm_start=False, criterion='silhouette', include_silhouette=None, algorithm='kmeans',
+                          training='full', batch_size=DEFAULT_BATCH_SIZE):
+    """Find optimal number of clusters using the selected validity criterion"""
+    print(f"\nFinding optimal number of clusters ({criterion})...")
     
-    silhouette_scores = []
     k_range = range(2, max_k + 1)
     
-    for k in k_range:
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(X)
-        silhouette_avg = silhouette_score(X, cluster_labels)
-        silhouette_scores.append(silhouette_avg)
-        print(f"   k={k}: Silhouette Score = {silhouette_avg:.3f}")
-    
-    optimal_k = k_range[np.argmax(silhouette_scores)]
+    # Silhouette is O(N^2); only compute it when selecting on it or asked to
+    if include_silhouette is None:
+        include_silhouette = criterion == 'silhouette'
+    sweep_silhouette = silhouette_mode if include_silhouette else None
+    
+    if warm_start and (algorithm == 'kmodes' or training == 'minibatch'):
+        raise ValueError("The warm-started sweep is only available for full-batch kmeans")
+    
+    if training == 'minibatch':
+        # Stream row blocks like the final fit and score every k on its holdout sample
+        results = sweep_k_minibatch(X, k_range, batch_size=batch_size, random_state=42,
+                                    silhouette_mode=sweep_silhouette, sample_size=sample_size)
+    elif warm_start:
+        # Seed each k from the previous solution (serial by construction)
+        results = sweep_k_warm(X, k_range, random_state=42, n_init=10,
+                               silhouette_mode=sweep_silhouette, sample_size=sample_size)
+    else:
+        # Fit every k (in parallel when n_jobs > 1, same results as serial)
+        results = sweep_k(X, k_range, n_jobs=n_jobs, random_state=42, n_init=10,
+                          silhouette_mode=sweep_silhouette, sample_size=sample_size, algorithm=algorithm)
+    
+    for result in results:
+        line = f"   k={result['k']}:"
+        if result['silhouette'] is not None:
+            line += f" Silhouette Score = {result['silhouette']:.3f}"
+            if sweep_silhouette == 'sampled':
+                ci_low, ci_high = result['silhouette_ci']
+                line += f" (CI {ci_low:.3f} to {ci_high:.3f})"
+            line += ","
+        line += (f" Calinski-Harabasz = {result['calinski_harabasz']:.1f},"
+                 f" Davies-Bouldin = {result['davies_bouldin']:.3f}, Inertia = {result['inertia']:.1f}")
+        print(line)
+    
+    optimal_k = select_k(results, criterion)
     print(f"Optimal k = {optimal_k}")
     return optimal_k
 
-def create_personas(df, feature_encoded, k=5):
-    """Create music personas using K-means clustering"""
+def persona_assignments(df, cluster_labels, distances):
+    """Lean per-respondent output: id, persona label and distance to its centroid"""
+    assignments = pd.DataFrame({
+        'persona_cluster': np.asarray(cluster_labels, dtype=np.int16),
+        'centroid_distance': np.asarray(distances, dtype=np.float32)
+    })
+    if 'participant_id' in df.columns:
+        assignments.insert(0, 'participant_id', df['participant_id'].to_numpy())
+    return assignments
+
+def create_personas(df, feature_encoded, k=5, silhouette_mode='exact', sample_size=DEFAULT_SAMPLE_SIZE,
+                    training='full', batch_size=DEFAULT_BATCH_SIZE, algorithm='kmeans'):
+    """Create music personas using K-means (or k-modes) clustering; returns lean assignments and the silhouette report"""
     print(f"\nCreating {k} music personas...")
     
-    # Standardize features
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(feature_encoded)
-    
-    # Perform clustering
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    cluster_labels = kmeans.fit_predict(X_scaled)
-    
-    # Add cluster labels to original dataframe
-    df_clustered = df.copy()
-    df_clustered['persona_cluster'] = cluster_labels
+    if algorithm == 'kmodes' and training == 'minibatch':
+        raise ValueError("k-modes trains on the in-memory answer codes; use training='full'")
+    
+    if training == 'minibatch':
+        # Stream row blocks (e.g. from the memory-mapped feature store)
+        kmeans, scaler, cluster_labels, distances, metrics = train_minibatch_kmeans(feature_encoded, k,
+                                                                                    batch_size=batch_size)
+        report = metrics['holdout_silhouette']
+        print(f"   Holdout inertia per respondent: {metrics['holdout_inertia_per_respondent']:.3f}")
+        print(f"   Holdout Silhouette Score: {report['mean']:.3f} ({metrics['holdout_size']} respondents)")
+        return persona_assignments(df, cluster_labels, distances), kmeans, scaler, report
+    
+    if algorithm == 'kmodes':
+        # Cluster answer codes directly: no one-hot expansion and no scaling
+        scaler = None
+        kmeans = KModes(n_clusters=k, random_state=42, n_init=10)
+        cluster_labels = kmeans.fit_predict(feature_encoded)
+        print(f"   Mismatched answers per respondent: {kmeans.inertia_ / len(cluster_labels):.3f}")
+        
+        # Same distance the persona model reports: sqrt(2 x mismatches) between one-hot rows
+        distances = np.sqrt(2.0 * assign_modes(as_codes(feature_encoded), kmeans.cluster_centers_)[1])
+        
+        # Score on one-hot rows, where Euclidean distance tracks matching dissimilarity
+        X_scaled = codes_to_onehot(feature_encoded)
+    else:
+        # Standardize features (without centring for sparse input; KMeans and
+        # silhouette are translation-invariant so the clustering is unchanged)
+        scaler = StandardScaler(with_mean=not issparse(feature_encoded))
+        X_scaled = scaler.fit_transform(feature_encoded)
+        
+        # Perform clustering
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+        cluster_labels = kmeans.fit_predict(X_scaled)
+        print(f"   Inertia per respondent: {kmeans.inertia_ / X_scaled.shape[0]:.3f}")
+        distances = np.sqrt(own_centroid_sq_distances(X_scaled, cluster_labels, kmeans.cluster_centers_))
     
-    # Calculate silhouette score
-    silhouette_avg = silhouette_score(X_scaled, cluster_labels)
-    print(f"   Silhouette Score: {silhouette_avg:.3f}")
+    # Calculate silhouette score (distances streamed in blocks, optionally sampled)
+    report = silhouette_report(X_scaled, cluster_labels, mode=silhouette_mode, sample_size=sample_size)
+    print(f"   Silhouette Score: {report['mean']:.3f}")
+    if silhouette_mode == 'sampled':
+        print(f"   {report['confidence']:.0%} CI: {report['ci_low']:.3f} to {report['ci_high']:.3f} ({report['n_scored']} respondents scored)")
     
-    return df_clustered, kmeans, scaler
+    return persona_assignments(df, cluster_labels, distances), kmeans, scaler, report
 
-def analyze_personas(df_clustered):
+def analyze_personas(df, cluster_labels):
     """Analyze characteristics of each persona"""
     print("\nAnalyzing persona characteristics...")
     
-    personas = {}
+    # Analyze key characteristics
+    key_questions = {
+        'music_relationship': 'Q1_Relationship_with_music',
+        'discovery_method': 'Q2_Discovering_music',
+        'age_group': 'AgeGroup_Broad',
+        'ai_attitude': 'Q10_Songs_by_AI',
+        'music_preference': 'Q9_Music_preference_these_days'
+    }
+    key_questions = {characteristic: column for characteristic, column in key_questions.items()
+                     if column in df.columns}
     
-    for cluster_id in sorted(df_clustered['persona_cluster'].unique()):
-        cluster_data = df_clustered[df_clustered['persona_cluster'] == cluster_id]
-        
-        persona = {
-            'id': cluster_id,
-            'size': len(cluster_data),
-            'percentage': (len(cluster_data) / len(df_clustered)) * 100,
-            'characteristics': {}
-        }
-        
-        # Analyze key characteristics
-        key_questions = {
-            'music_relationship': 'Q1_Relationship_with_music',
-            'discovery_method': 'Q2_Discovering_music',
-            'age_group': 'AgeGroup_Broad',
-            'ai_attitude': 'Q10_Songs_by_AI',
-            'music_preference': 'Q9_Music_preference_these_days'
-        }
-        
-        for characteristic, column in key_questions.items():
-            if column in cluster_data.columns:
-                top_response = cluster_data[column].mode().iloc[0] if not cluster_data[column].mode().empty else 'Unknown'
-                response_distribution = cluster_data[column].value_counts().head(3).to_dict()
-                persona['characteristics'][characteristic] = {
-                    'top_response': top_response,
-                    'distribution': response_distribution
-                }
-        
-        personas[f'persona_{cluster_id}'] = persona
-        
-        print(f"\n   Persona {cluster_id} ({persona['size']} people, {persona['percentage']:.1f}%):")
+    # One grouped counting pass per question covers every persona; the
+    # tables are kept so later batches can be folded in without a rescan
+    tables = build_count_tables(df, cluster_labels, key_questions)
+    personas = personas_from_tables(tables, top_n=3)
+    
+    for persona in personas.values():
+        print(f"\n   Persona {persona['id']} ({persona['size']} people, {persona['percentage']:.1f}%):")
         print(f"     Music Relationship: {persona['characteristics']['music_relationship']['top_response']}")
         print(f"     Discovery Method: {persona['characteristics']['discovery_method']['top_response']}")
         print(f"     Age Group: {persona['characteristics']['age_group']['top_response']}")
         print(f"     AI Attitude: {persona['characteristics']['ai_attitude']['top_response']}")
     
-    return personas
+    return personas, tables
 
 def generate_persona_names_and_descriptions(personas):
     """Generate names and descriptions for each persona"""
@@ -183,7 +269,7 @@ def generate_persona_names_and_descriptions(personas):
     
     return personas
 
-def export_persona_data(personas, df_clustered):
+def export_persona_data(personas, assignments):
     """Export persona data for frontend use"""
     print("\nExporting persona data...")
     
@@ -196,46 +282,162 @@ def export_persona_data(personas, df_clustered):
     with open(personas_file, 'w') as f:
         json.dump(personas, f, indent=2)
     
-    # Export clustered data
-    clustered_file = output_dir / "clustered_data.csv"
-    df_clustered.to_csv(clustered_file, index=False)
+    # Export persona assignments; join back to the survey data on participant_id
+    clustered_file = output_dir / "clustered_data.parquet"
+    assignments.to_parquet(clustered_file, index=False, compression='zstd')
     
     print(f"   Personas exported to: {personas_file}")
     print(f"   Clustered data exported to: {clustered_file}")
 
-def main():
-    """Main clustering pipeline"""
+def main(sparse=False, n_jobs=1, silhouette_mode='exact', sample_size=DEFAULT_SAMPLE_SIZE,
+         training='full', batch_size=DEFAULT_BATCH_SIZE, max_k=8, warm_start=False,
+         criterion='silhouette', sweep_silhouette=None, algorithm='kmeans',
+         stability_resamples=DEFAULT_N_RESAMPLES, refresh=False, publish_web=False, trace_file=None):
+    """Main clustering pipeline (steps are reused unless their inputs change)"""
     print("Canadian Music DNA - Persona Clustering Analysis")
     print("="*60)
+    trace = StageTrace('persona_clustering')
     
     # Load data
-    df = load_and_prepare_data()
-    if df is None:
-        return
-    
-    # Feature engineering
-    feature_encoded, feature_mapping = feature_engineering(df)
+    with trace.stage('load') as stage:
+        df = load_and_prepare_data()
+        if df is None:
+            return
+        source_key = survey_data_hash()
+        stage['rows'] = n_rows = len(df)
+    
+    # Feature engineering (the sparse path persists its own feature store)
+    with trace.stage('features', rows=n_rows):
+        if training == 'minibatch':
+            # Encode the survey chunk by chunk into the on-disk store and train from its memory map
+            print("\nBuilding the feature store chunk by chunk...")
+            columns = list(CLUSTERING_FEATURES.values())
+            store_dir, features_key = cached_step(
+                'features', build_feature_store, (partial(iter_survey_chunks, columns=columns),), {'columns': columns},
+                upstream=[source_key], refresh=refresh, enabled=False, modules=[feature_store, survey_cache])
+            feature_encoded, _ = load_feature_store(store_dir)
+            feature_mapping = CLUSTERING_FEATURES
+            print(f"   Features created: {feature_encoded.shape[1]} dimensions (memory-mapped, nnz={feature_encoded.nnz})")
+        else:
+            (feature_encoded, feature_mapping), features_key = cached_step(
+                'features', feature_engineering, (df,),
+                {'sparse': sparse, 'codes': algorithm == 'kmodes', 'features': CLUSTERING_FEATURES},
+                upstream=[source_key], refresh=refresh, enabled=not sparse, modules=[feature_store])
     
     # Find optimal clusters
-    optimal_k = find_optimal_clusters(feature_encoded)
+    with trace.stage('sweep', rows=n_rows, max_k=max_k):
+        optimal_k, _ = cached_step(
+            'sweep', find_optimal_clusters, (feature_encoded,),
+            {'max_k': max_k, 'silhouette_mode': silhouette_mode, 'sample_size': sample_size, 'warm_start': warm_start,
+             'criterion': criterion, 'include_silhouette': sweep_silhouette, 'algorithm': algorithm,
+             'training': training, 'batch_size': batch_size},
+            upstream=[features_key], options={'n_jobs': n_jobs}, refresh=refresh,
+            modules=[cluster_sweep, cluster_validity, kmodes, minibatch_training, silhouette])
     
     # Create personas
-    df_clustered, kmeans, scaler = create_personas(df, feature_encoded, k=optimal_k)
+    with trace.stage('personas', rows=n_rows, k=optimal_k):
+        (assignments, kmeans, scaler, report), model_key = cached_step(
+            'personas', create_personas, (df, feature_encoded),
+            {'k': optimal_k, 'silhouette_mode': silhouette_mode, 'sample_size': sample_size,
+             'training': training, 'batch_size': batch_size, 'algorithm': algorithm},
+            upstream=[features_key], refresh=refresh,
+            modules=[cluster_validity, kmodes, minibatch_training, silhouette])
+    
+        # Per-respondent values flag people sitting between two personas (written on cache hits too)
+        samples_file = export_silhouette_samples(report, assignments['persona_cluster'], df.get('participant_id'))
+        print(f"   Per-respondent silhouette exported to: {samples_file}")
+    
+    # Persist the fitted model so new respondents can be labelled without refitting
+    with trace.stage('save_model'):
+        if training == 'minibatch':
+            vocabulary, _ = load_vocabulary()
+        else:
+            vocabulary = build_vocabulary(df, list(feature_mapping.values()))
+        model_dir = save_persona_model(kmeans, scaler, vocabulary, feature_mapping)
+        print(f"   Persona model saved to: {model_dir}")
+    
+    # Refit on bootstrap resamples to check the personas are not seed artefacts
+    if stability_resamples and training == 'full':
+        with trace.stage('stability', rows=n_rows, resamples=stability_resamples):
+            X_stability = feature_encoded if scaler is None else scaler.transform(feature_encoded)
+            stability, _ = cached_step(
+                'stability', bootstrap_stability, (X_stability, assignments['persona_cluster']),
+                {'n_resamples': stability_resamples, 'algorithm': algorithm},
+                upstream=[model_key], options={'n_jobs': n_jobs}, refresh=refresh,
+                modules=[persona_stability, cluster_sweep, kmodes])
+            stability_file = export_stability(stability)
+            print(f"   Stability report exported to: {stability_file}")
     
     # Analyze personas
-    personas = analyze_personas(df_clustered)
+    with trace.stage('profiles', rows=n_rows):
+        (personas, tables), _ = cached_step('profiles', analyze_personas, (df, assignments['persona_cluster']),
+                                            upstream=[model_key], refresh=refresh, modules=[persona_profile])
+        counts_file = save_count_tables(tables)
+        print(f"   Persona count tables saved to: {counts_file}")
     
     # Generate names and descriptions
-    personas = generate_persona_names_and_descriptions(personas)
+    with trace.stage('names'):
+        personas = generate_persona_names_and_descriptions(personas)
     
     # Export data
-    export_persona_data(personas, df_clustered)
+    with trace.stage('export', rows=n_rows):
+        export_persona_data(personas, assignments)
+    
+        # The web app shows run_analysis's personas; a sweep run only replaces them on request
+        if publish_web:
+            export_web_bundle(personas)
     
     print("\n" + "="*60)
     print("Persona clustering complete!")
     print(f"   Created {len(personas)} distinct music personas")
     print("   Data ready for frontend integration")
     print("="*60)
+    
+    trace.summary()
+    print(f"   Stage trace written to: {trace.write(trace_file)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Canadian Music DNA persona clustering")
+    parser.add_argument('--sparse', action='store_true',
+                        help="use the sparse CSR feature store instead of dense one-hot columns")
+    parser.add_argument('--training', choices=['full', 'minibatch'], default='full',
+                        help="full-batch KMeans in memory, or MiniBatch KMeans streamed from the feature store")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per mini-batch in minibatch training")
+    parser.add_argument('--algorithm', choices=['kmeans', 'kmodes'], default='kmeans',
+                        help="KMeans on standardized one-hot features, or k-modes on the answer codes")
+    parser.add_argument('--silhouette', choices=SILHOUETTE_MODES, default='exact',
+                        help="score every respondent or a stratified sample")
+    parser.add_argument('--silhouette-sample', type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help="respondents scored in sampled silhouette mode")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="worker processes for the k-sweep (-1 = all cores)")
+    parser.add_argument('--max-k', type=int, default=8,
+                        help="largest number of personas tried in the k-sweep")
+    parser.add_argument('--warm-start', action='store_true',
+                        help="seed each k from the k-1 solution instead of restarting from scratch")
+    parser.add_argument('--criterion', choices=SELECTION_CRITERIA, default='silhouette',
+                        help="validity criterion used to pick k (all but silhouette are linear-time)")
+    parser.add_argument('--sweep-silhouette', action='store_true', default=None,
+                        help="also report silhouette in the k-sweep when selecting on another criterion")
+    parser.add_argument('--stability-resamples', type=int, default=DEFAULT_N_RESAMPLES,
+                        help="bootstrap refits for the persona stability report (0 = skip)")
+    parser.add_argument('--refresh', action='store_true',
+                        help="recompute every pipeline step instead of reusing cached results")
+    parser.add_argument('--publish-web', action='store_true',
+                        help="also replace the web app's persona bundle with these personas")
+    parser.add_argument('--trace', type=Path, default=None,
+                        help="where to write the per-stage Chrome trace (default data/traces/)")
+    args = parser.parse_args()
+    if args.algorithm == 'kmodes' and args.training == 'minibatch':
+        parser.error("--algorithm kmodes only supports --training full")
+    if args.warm_start and args.training == 'minibatch':
+        parser.error("--warm-start only supports --training full")
+    if args.warm_start and args.algorithm != 'kmeans':
+        parser.error("--warm-start only supports --algorithm kmeans")
+    main(sparse=args.sparse, n_jobs=args.jobs, silhouette_mode=args.silhouette, sample_size=args.silhouette_sample,
+         training=args.training, batch_size=args.batch_size, max_k=args.max_k, warm_start=args.warm_start,
+         criterion=args.criterion, sweep_silhouette=args.sweep_silhouette,
+         algorithm=args.algorithm,
+         stability_resamples=args.stability_resamples, refresh=args.refresh, publish_web=args.publish_web,
+         trace_file=args.trace)
\ No newline at end of file
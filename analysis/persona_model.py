@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Persisted persona model and streaming batch assignment
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+A persona model bundle holds everything needed to label a respondent
+without refitting: centroids, scaler statistics and the one-hot
+vocabulary from feature_engineering.
+
+Because every feature is one-hot, the squared distance from a scaled
+respondent to each centroid is
+
+    base + sum of delta[i] over the respondent's active one-hot columns i
+
+where base is the distance from the scaled all-zero vector and delta[i]
+is the change from switching column i on. Both are precomputed at load
+time. A single respondent costs a handful of dictionary lookups and row
+sums, and a batch costs one sparse x dense product.
+
+Usage:
+    python persona_model.py new_signups.ndjson --output labels.csv
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from feature_store import MISSING_CATEGORY, codes_to_csr, encode_codes
+from kmodes import KModes
+
+PERSONA_MODEL_DIR = Path(__file__).parent.parent / "data" / "processed" / "persona_model"
+DEFAULT_CHUNKSIZE = 100000
+
+
+def save_persona_model(kmeans, scaler, vocabulary, features, model_dir=PERSONA_MODEL_DIR):
+    """Write centroids, scaler statistics and vocabulary as a model bundle (scaler=None: unscaled)"""
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    centroids = np.asarray(kmeans.cluster_centers_)
+    if isinstance(kmeans, KModes):
+        # k-modes centres are answer codes; as unscaled one-hot rows their
+        # squared distance is twice the matching dissimilarity
+        centroids = codes_to_csr(centroids, vocabulary).toarray()
+    centroids = centroids.astype(np.float64)
+    n_dims = centroids.shape[1]
+    mean = scaler.mean_ if getattr(scaler, 'with_mean', False) else np.zeros(n_dims)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(n_dims)
+
+    np.save(model_dir / "centroids.npy", centroids)
+    np.save(model_dir / "scaler_mean.npy", np.asarray(mean, dtype=np.float64))
+    np.save(model_dir / "scaler_scale.npy", np.asarray(scale, dtype=np.float64))
+    with open(model_dir / "model.json", 'w', encoding='utf-8') as f:
+        json.dump({
+            'n_personas': int(centroids.shape[0]),
+            'n_dimensions': int(n_dims),
+            'features': features,
+            'vocabulary': vocabulary
+        }, f, ensure_ascii=False, indent=2)
+    return model_dir
+
+
+def load_persona_model(model_dir=PERSONA_MODEL_DIR):
+    """Load a model bundle and precompute the one-hot distance tables"""
+    model_dir = Path(model_dir)
+    with open(model_dir / "model.json", 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    centroids = np.load(model_dir / "centroids.npy")
+    mean = np.load(model_dir / "scaler_mean.npy")
+    scale = np.load(model_dir / "scaler_scale.npy")
+
+    # Scaled position of the all-zero vector and of each column switched on
+    origin = -mean / scale
+    switched_on = origin + 1.0 / scale
+    base = ((origin[None, :] - centroids) ** 2).sum(axis=1)
+    delta = (switched_on[:, None] - centroids.T) ** 2 - (origin[:, None] - centroids.T) ** 2
+
+    # Column -> {answer: one-hot index} for single-respondent lookups
+    lookup = {}
+    offset = 0
+    for column, categories in meta['vocabulary'].items():
+        lookup[column] = {category: offset + i for i, category in enumerate(categories)}
+        offset += len(categories)
+
+    return {
+        'vocabulary': meta['vocabulary'],
+        'features': meta['features'],
+        'centroids': centroids,
+        'base': base,
+        'delta': np.ascontiguousarray(delta),
+        'lookup': lookup
+    }
+
+
+def assign_respondent(model, answers):
+    """Label one respondent given {column: answer}"""
+    active = []
+    for column, index in model['lookup'].items():
+        answer = answers.get(column)
+        if answer is None or (isinstance(answer, float) and np.isnan(answer)):
+            answer = MISSING_CATEGORY
+        if answer in index:
+            active.append(index[answer])
+
+    squared = model['base'] + model['delta'][active].sum(axis=0)
+    persona = int(squared.argmin())
+    return persona, float(np.sqrt(max(squared[persona], 0.0)))
+
+
+def assign_batch(model, df):
+    """Label a batch of respondents, returning labels and centroid distances"""
+    codes = encode_codes(df, model['vocabulary'])
+    X = codes_to_csr(codes, model['vocabulary'])
+    squared = model['base'][None, :] + X @ model['delta']
+    labels = squared.argmin(axis=1)
+    distances = np.sqrt(np.maximum(squared[np.arange(len(labels)), labels], 0.0))
+    return labels.astype(np.int32), distances.astype(np.float32)
+
+
+def read_respondents(input_path, input_format, columns, chunksize):
+    """Iterate over CSV or NDJSON respondents in chunks"""
+    source = sys.stdin if str(input_path) == '-' else input_path
+    if input_format == 'ndjson':
+        for chunk in pd.read_json(source, lines=True, chunksize=chunksize, dtype=False):
+            yield chunk.reindex(columns=columns)
+    else:
+        # An explicit column list parses much faster than a usecols callable
+        if source is sys.stdin:
+            usecols = lambda col: col in columns
+        else:
+            header = pd.read_csv(source, nrows=0).columns
+            usecols = [col for col in header if col in columns]
+        yield from pd.read_csv(source, usecols=usecols, chunksize=chunksize)
+
+
+def assign_stream(model, input_path, output_path='-', input_format=None, output_format=None,
+                  chunksize=DEFAULT_CHUNKSIZE):
+    """Stream respondents from CSV/NDJSON and write persona labels with distances"""
+    input_format = input_format or ('ndjson' if str(input_path).endswith(('.ndjson', '.jsonl')) else 'csv')
+    output_format = output_format or ('ndjson' if str(output_path).endswith(('.ndjson', '.jsonl')) else 'csv')
+    columns = ['participant_id'] + list(model['vocabulary'])
+
+    out = sys.stdout if str(output_path) == '-' else open(output_path, 'w', encoding='utf-8', newline='')
+    total = 0
+    try:
+        for chunk in read_respondents(input_path, input_format, columns, chunksize):
+            labels, distances = assign_batch(model, chunk)
+            result = pd.DataFrame({'persona_cluster': labels, 'centroid_distance': distances})
+            if 'participant_id' in chunk:
+                result.insert(0, 'participant_id', chunk['participant_id'].to_numpy())
+
+            if output_format == 'ndjson':
+                text = result.to_json(orient='records', lines=True, force_ascii=False)
+                out.write(text if text.endswith('\n') else text + '\n')
+            else:
+                result.to_csv(out, index=False, header=(total == 0))
+            total += len(result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return total
+
+
+def main():
+    """Batch-assign personas to new respondents"""
+    parser = argparse.ArgumentParser(description="Assign music personas with a saved persona model")
+    parser.add_argument('input', help="respondents as CSV or NDJSON ('-' for stdin)")
+    parser.add_argument('--output', default='-', help="where to write labels ('-' for stdout)")
+    parser.add_argument('--input-format', choices=['csv', 'ndjson'], default=None)
+    parser.add_argument('--output-format', choices=['csv', 'ndjson'], default=None)
+    parser.add_argument('--model-dir', type=Path, default=PERSONA_MODEL_DIR)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    model = load_persona_model(args.model_dir)
+    start = time.perf_counter()
+    total = assign_stream(model, args.input, args.output, args.input_format, args.output_format, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"Assigned {total} respondents in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Vectorized persona profiling
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Builds every cluster x answer count table in a single pass per question:
+answers are factorized to integer codes and counted with one bincount
+over cluster * n_answers + code. Top responses and top-N distributions
+are then read off the small count tables, so profiling cost no longer
+grows with the number of personas.
+
+The top response breaks ties like Series.mode (smallest tied answer).
+Distributions list tied answers in order of first appearance within the
+persona; value_counts' unstable sort gives no such guarantee.
+
+The persona count tables (persona_counts.json) persist those counts for
+the key questions. A batch of newly labelled respondents is folded in by
+counting just the batch, and personas.json is refreshed from the tables
+in time proportional to the batch rather than the full history.
+
+Usage:
+    python persona_profile.py new_respondents.csv --labels labels.csv
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MISSING_RESPONSE = 'Unknown'
+PROCESSED_DIR = Path(__file__).parent.parent / "data" / "processed"
+PERSONA_COUNTS_FILE = PROCESSED_DIR / "persona_counts.json"
+PERSONAS_FILE = PROCESSED_DIR / "personas.json"
+
+
+def cluster_answer_counts(cluster_codes, answers, n_clusters):
+    """Count every (cluster, answer) pair and the row where each first appears"""
+    codes, uniques = pd.factorize(answers)
+    uniques = np.asarray(uniques, dtype=object)
+    n_answers = len(uniques)
+    
+    valid = codes >= 0
+    cells = cluster_codes[valid] * n_answers + codes[valid]
+    counts = np.bincount(cells, minlength=n_clusters * n_answers).reshape(n_clusters, n_answers)
+    
+    first_seen = np.full(n_clusters * n_answers, len(codes), dtype=np.int64)
+    np.minimum.at(first_seen, cells, np.flatnonzero(valid))
+    return uniques, counts, first_seen.reshape(n_clusters, n_answers)
+
+
+def answer_ranks(uniques):
+    """Rank answers by sorted value (mode tie-breaking), falling back to first-seen order"""
+    try:
+        order = pd.Index(uniques).argsort()
+    except TypeError:
+        order = np.arange(len(uniques))
+    ranks = np.empty(len(uniques), dtype=np.int64)
+    ranks[order] = np.arange(len(uniques))
+    return ranks
+
+
+def top_answers(uniques, counts, first_seen, top_n=3):
+    """Top response and top-N distribution for every cluster"""
+    ranks = answer_ranks(uniques)
+    results = []
+    for row, seen in zip(counts, first_seen):
+        answered = np.flatnonzero(row)
+        if not len(answered):
+            results.append((MISSING_RESPONSE, {}))
+            continue
+    
+        # Mode: highest count, smallest answer on ties
+        tied = answered[row[answered] == row[answered].max()]
+        top_response = uniques[tied[ranks[tied].argmin()]]
+    
+        # Distribution: highest counts first, first appearance on ties
+        order = answered[np.lexsort((seen[answered], -row[answered]))][:top_n]
+        results.append((top_response, {uniques[i]: int(row[i]) for i in order}))
+    return results
+
+
+def native(value):
+    """Convert numpy scalars to plain Python values for JSON"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def empty_count_tables(questions, n_clusters):
+    """Count tables with no respondents for {characteristic: column}"""
+    return {
+        'n_clusters': int(n_clusters),
+        'total': 0,
+        'sizes': [0] * n_clusters,
+        'questions': dict(questions),
+        'tables': {column: {'answers': [], 'counts': [[] for _ in range(n_clusters)],
+                            'first_seen': [[] for _ in range(n_clusters)]}
+                   for column in questions.values()}
+    }
+
+
+def update_count_tables(tables, df, labels):
+    """Fold a batch of labelled respondents into the count tables in place"""
+    labels = np.asarray(labels, dtype=np.int64)
+    n_clusters = tables['n_clusters']
+    if len(labels) and (labels.min() < 0 or labels.max() >= n_clusters):
+        raise ValueError(f"Persona labels must be between 0 and {n_clusters - 1}")
+    
+    offset = tables['total']
+    batch_sizes = np.bincount(labels, minlength=n_clusters)
+    tables['sizes'] = [int(size) for size in np.asarray(tables['sizes']) + batch_sizes]
+    tables['total'] = offset + len(labels)
+    
+    for column, table in tables['tables'].items():
+        if column not in df.columns:
+            continue
+        uniques, batch_counts, batch_seen = cluster_answer_counts(labels, df[column], n_clusters)
+        
+        # Map the batch's answers onto the stored answer list, appending new ones
+        positions = {answer: i for i, answer in enumerate(table['answers'])}
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, answer in enumerate(uniques):
+            answer = native(answer)
+            if answer not in positions:
+                positions[answer] = len(table['answers'])
+                table['answers'].append(answer)
+            mapping[i] = positions[answer]
+        
+        n_answers = len(table['answers'])
+        stored = len(table['counts'][0])
+        counts = np.zeros((n_clusters, n_answers), dtype=np.int64)
+        first_seen = np.full((n_clusters, n_answers), -1, dtype=np.int64)
+        counts[:, :stored] = np.asarray(table['counts'], dtype=np.int64).reshape(n_clusters, stored)
+        first_seen[:, :stored] = np.asarray(table['first_seen'], dtype=np.int64).reshape(n_clusters, stored)
+        
+        # Each batch answer has its own column, so plain fancy indexing is safe
+        counts[:, mapping] += batch_counts
+        seen = first_seen[:, mapping]
+        fresh = (batch_counts > 0) & (seen < 0)
+        seen[fresh] = batch_seen[fresh] + offset
+        first_seen[:, mapping] = seen
+        
+        table['counts'] = counts.tolist()
+        table['first_seen'] = first_seen.tolist()
+    return tables
+
+
+def build_count_tables(df, labels, questions, n_clusters=None):
+    """Count tables for the key questions over a labelled dataset"""
+    labels = np.asarray(labels, dtype=np.int64)
+    if n_clusters is None:
+        n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    return update_count_tables(empty_count_tables(questions, n_clusters), df, labels)
+
+
+def personas_from_tables(tables, top_n=3):
+    """Persona sizes, percentages and characteristics from the count tables"""
+    answer_stats = {}
+    for column, table in tables['tables'].items():
+        answers = np.asarray(table['answers'], dtype=object)
+        counts = np.asarray(table['counts'], dtype=np.int64).reshape(tables['n_clusters'], len(answers))
+        first_seen = np.asarray(table['first_seen'], dtype=np.int64).reshape(counts.shape)
+        answer_stats[column] = top_answers(answers, counts, first_seen, top_n)
+    
+    personas = {}
+    for cluster_id, size in enumerate(tables['sizes']):
+        if not size:
+            continue
+        characteristics = {}
+        for characteristic, column in tables['questions'].items():
+            top_response, distribution = answer_stats[column][cluster_id]
+            characteristics[characteristic] = {
+                'top_response': native(top_response),
+                'distribution': {str(answer): count for answer, count in distribution.items()}
+            }
+        personas[f'persona_{cluster_id}'] = {
+            'id': cluster_id,
+            'size': int(size),
+            'percentage': float((size / tables['total']) * 100),
+            'characteristics': characteristics
+        }
+    return personas
+
+
+def save_count_tables(tables, counts_file=PERSONA_COUNTS_FILE):
+    """Persist the persona count tables"""
+    counts_file = Path(counts_file)
+    counts_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(counts_file, 'w', encoding='utf-8') as f:
+        json.dump(tables, f, ensure_ascii=False)
+    return counts_file
+
+
+def load_count_tables(counts_file=PERSONA_COUNTS_FILE):
+    """Load persisted persona count tables"""
+    with open(counts_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def refresh_personas_file(tables, personas_file=PERSONAS_FILE, top_n=3):
+    """Update sizes, percentages and characteristics in personas.json, keeping names and descriptions"""
+    with open(personas_file, 'r', encoding='utf-8') as f:
+        personas = json.load(f)
+    for key, stats in personas_from_tables(tables, top_n).items():
+        personas.setdefault(key, {}).update(stats)
+    with open(personas_file, 'w', encoding='utf-8') as f:
+        json.dump(personas, f, indent=2)
+    return personas
+
+
+def main():
+    """Fold newly labelled respondents into the persona profiles"""
+    parser = argparse.ArgumentParser(description="Update persona profiles with newly labelled respondents")
+    parser.add_argument('input', type=Path, help="CSV of new respondents (with persona_cluster, or see --labels)")
+    parser.add_argument('--labels', type=Path, default=None,
+                        help="persona_model.py output to join on participant_id")
+    parser.add_argument('--counts-file', type=Path, default=PERSONA_COUNTS_FILE)
+    parser.add_argument('--personas-file', type=Path, default=PERSONAS_FILE)
+    args = parser.parse_args()
+    
+    tables = load_count_tables(args.counts_file)
+    batch = pd.read_csv(args.input, usecols=lambda col: col in tables['tables'] or col in ('participant_id', 'persona_cluster'))
+    if args.labels is not None:
+        labels = pd.read_csv(args.labels, usecols=['participant_id', 'persona_cluster'])
+        batch = batch.drop(columns='persona_cluster', errors='ignore').merge(labels, on='participant_id', how='inner')
+    
+    update_count_tables(tables, batch, batch['persona_cluster'].to_numpy())
+    save_count_tables(tables, args.counts_file)
+    refresh_personas_file(tables, args.personas_file)
+    print(f"Added {len(batch)} respondents; personas now cover {tables['total']} respondents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Bootstrap stability of the persona clustering
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Checks whether the personas are real structure or artefacts of one seed.
+The clustering is refitted on bootstrap resamples (each with its own
+seed) and every refit labels the full dataset. The report covers:
+
+- adjusted Rand index (ARI) of each refit against the published personas
+  and between every pair of refits;
+- per-persona Jaccard stability: for each persona, the best Jaccard
+  overlap with any refitted cluster on the resampled respondents. Means
+  of 0.75 or more suggest a stable persona; below 0.5 the persona
+  "dissolves".
+
+Refits run across a process pool. As in cluster_sweep, the encoded matrix
+is placed in shared memory once and workers attach to it instead of
+receiving a pickled copy per task, through cluster_sweep's worker setup.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+from threadpoolctl import threadpool_limits
+
+import cluster_sweep
+from cluster_sweep import as_float_matrix, release_blocks, resolve_jobs, share_matrix
+from kmodes import KModes, as_codes
+
+PERSONA_STABILITY_FILE = Path(__file__).parent.parent / "data" / "processed" / "persona_stability.json"
+DEFAULT_N_RESAMPLES = 20
+STABLE_JACCARD = 0.75
+DISSOLVED_JACCARD = 0.5
+
+def fit_resample(X, k, resample, random_state=42, n_init=10, algorithm='kmeans'):
+    """Refit on one bootstrap resample and label every respondent"""
+    rng = np.random.default_rng([random_state, resample])
+    rows = rng.integers(0, X.shape[0], size=X.shape[0])
+    seed = random_state + resample + 1
+    
+    if algorithm == 'kmodes':
+        model = KModes(n_clusters=k, random_state=seed, n_init=n_init).fit(X[rows])
+    else:
+        model = KMeans(n_clusters=k, random_state=seed, n_init=n_init).fit(X[rows])
+    return model.predict(X).astype(np.int32), np.unique(rows)
+
+
+def _fit_shared_resample(resample, options):
+    """Worker entry point: refit on the attached matrix, single-threaded"""
+    with threadpool_limits(limits=1):
+        return fit_resample(cluster_sweep._WORKER_MATRIX, resample=resample, **options)
+
+
+def best_jaccard(reference, labels, n_reference, n_labels):
+    """Best Jaccard overlap of each reference cluster with any refitted cluster"""
+    table = np.bincount(reference.astype(np.int64) * n_labels + labels,
+                        minlength=n_reference * n_labels).reshape(n_reference, n_labels)
+    union = table.sum(axis=1)[:, None] + table.sum(axis=0)[None, :] - table
+    with np.errstate(divide='ignore', invalid='ignore'):
+        jaccard = np.where(union > 0, table / union, 0.0)
+    return jaccard.max(axis=1)
+
+
+def summarize(values):
+    """Mean, spread and range of a list of scores"""
+    values = np.asarray(values, dtype=np.float64)
+    return {'mean': float(values.mean()), 'std': float(values.std()),
+            'min': float(values.min()), 'max': float(values.max())}
+
+
+def bootstrap_stability(X, reference_labels, n_resamples=DEFAULT_N_RESAMPLES, n_jobs=1,
+                        random_state=42, n_init=10, algorithm='kmeans'):
+    """Refit on bootstrap resamples and score agreement with the reference personas"""
+    print(f"\nAssessing persona stability ({n_resamples} bootstrap refits)...")
+    reference = np.asarray(reference_labels, dtype=np.int32)
+    k = int(reference.max()) + 1
+    X = as_codes(X) if algorithm == 'kmodes' else as_float_matrix(X)
+    options = {'k': k, 'random_state': random_state, 'n_init': n_init, 'algorithm': algorithm}
+    
+    n_workers = resolve_jobs(n_jobs, n_resamples)
+    if n_workers == 1:
+        refits = [fit_resample(X, resample=r, **options) for r in range(n_resamples)]
+    else:
+        blocks, spec = share_matrix(X)
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=cluster_sweep._init_worker, initargs=(spec,)) as pool:
+                futures = [pool.submit(_fit_shared_resample, r, options) for r in range(n_resamples)]
+                refits = [future.result() for future in futures]
+        finally:
+            release_blocks(blocks, unlink=True)
+    
+    labels = [refit_labels for refit_labels, _ in refits]
+    ari_to_reference = [adjusted_rand_score(reference, refit_labels) for refit_labels in labels]
+    pairwise_ari = [adjusted_rand_score(a, b) for a, b in combinations(labels, 2)]
+    
+    # Jaccard on the resampled respondents only, as in Hennig's clusterwise stability
+    jaccard = np.array([best_jaccard(reference[in_bag], refit_labels[in_bag], k, k)
+                        for refit_labels, in_bag in refits])
+    
+    personas = {}
+    for cluster_id in range(k):
+        scores = jaccard[:, cluster_id]
+        stable = bool(scores.mean() >= STABLE_JACCARD)
+        personas[f'persona_{cluster_id}'] = {
+            'jaccard_mean': float(scores.mean()),
+            'jaccard_min': float(scores.min()),
+            'dissolved_rate': float((scores < DISSOLVED_JACCARD).mean()),
+            'stable': stable
+        }
+        print(f"   Persona {cluster_id}: Jaccard {scores.mean():.2f} (min {scores.min():.2f})"
+              + ("" if stable else " - unstable"))
+    
+    report = {
+        'algorithm': algorithm,
+        'k': k,
+        'n_resamples': n_resamples,
+        'random_state': random_state,
+        'ari_to_reference': summarize(ari_to_reference),
+        'pairwise_ari': summarize(pairwise_ari) if pairwise_ari else None,
+        'personas': personas
+    }
+    print(f"   ARI vs published personas: {report['ari_to_reference']['mean']:.3f}")
+    if pairwise_ari:
+        print(f"   Pairwise ARI between refits: {report['pairwise_ari']['mean']:.3f}")
+    return report
+
+
+def export_stability(report, output_file=PERSONA_STABILITY_FILE):
+    """Write the stability report next to personas.json"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output_file
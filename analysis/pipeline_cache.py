@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Content-hash step caching for the persona pipeline
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Each expensive pipeline step (feature engineering, the k-sweep, fitting,
+stability, profiling) is stored under a key built from:
+
+- the step name, the source code of the step function and of the
+  modules it calls into (cluster_sweep, silhouette, ...),
+- its parameters,
+- the keys of the steps it consumes (the first being the survey CSV's
+  SHA-256).
+
+Keys chain like a Merkle tree, so no large input is ever re-hashed. A
+step only reruns when something upstream actually changed, and editing
+persona names or descriptions reuses everything before them. Results are
+stored with joblib under data/cache/steps; pass refresh=True (--refresh)
+to recompute regardless.
+"""
+
+import hashlib
+import inspect
+import json
+
+import joblib
+
+from survey_cache import CACHE_DIR
+
+STEP_CACHE_DIR = CACHE_DIR / "steps"
+MAX_ENTRIES_PER_STEP = 3
+
+
+def step_key(name, func, params=None, upstream=(), modules=()):
+    """Hash a step's name, code (with that of the modules it depends on), parameters and upstream keys"""
+    payload = json.dumps({
+        'step': name,
+        'code': inspect.getsource(func),
+        'modules': {module.__name__: inspect.getsource(module) for module in modules},
+        'params': params or {},
+        'upstream': list(upstream)
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def prune_step(step_dir, keep=MAX_ENTRIES_PER_STEP):
+    """Drop all but the most recently used results of a step"""
+    entries = sorted(step_dir.glob('*.joblib'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in entries[keep:]:
+        stale.unlink()
+
+
+def cached_step(name, func, args=(), params=None, upstream=(), options=None, refresh=False, enabled=True,
+                modules=(), cache_dir=STEP_CACHE_DIR):
+    """Run func(*args, **params, **options) or reuse its stored result; returns (result, key)
+    
+    args are the large inputs and are identified only through upstream keys;
+    options (such as n_jobs) must not change the result and are not hashed.
+    modules are the modules func calls into, so editing them invalidates the step.
+    With enabled=False the step always runs but still yields its key.
+    """
+    params = params or {}
+    key = step_key(name, func, params, upstream, modules)
+    path = cache_dir / name / f"{key}.joblib"
+    
+    if enabled and not refresh and path.exists():
+        print(f"\nReusing cached {name} step ({key})")
+        path.touch()
+        return joblib.load(path), key
+    
+    result = func(*args, **params, **(options or {}))
+    if enabled:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        joblib.dump(result, tmp_path)
+        tmp_path.replace(path)
+        prune_step(path.parent)
+    return result, key
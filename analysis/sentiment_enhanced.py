@@ -4,23 +4,31 @@ Enhanced Sentiment Analysis for Canadian Music DNA
 Vancouver AI Hackathon Round 4: The Soundtrack of Us
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import json
 from pathlib import Path
-import re
-from collections import Counter
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from open_ended_shards import DEFAULT_SHARD_ROWS, analyze_columns
+from stage_trace import StageTrace
+from survey_cache import CLUSTERED_DATA_FILE, load_clustered_data, load_survey_data
+from term_matrix import build_term_matrix
+from token_cache import load_term_matrix, open_ended_responses, save_term_matrix
+from theme_matcher import theme_matcher
+
 def load_data():
-    """Load the music survey data"""
-    data_path = Path(__file__).parent.parent.parent / "vanai-hackathon-004-master" / "data" / "raw" / "music_survey_data.csv"
-    return pd.read_csv(data_path)
+    """Load the music survey data, with persona assignments once they are exported"""
+    if CLUSTERED_DATA_FILE.exists():
+        return load_clustered_data()
+    return load_survey_data()
 
-def analyze_open_ended_responses(df):
+def analyze_open_ended_responses(df, matcher=None, n_jobs=1, shard_rows=DEFAULT_SHARD_ROWS, refresh=False):
     """Analyze open-ended responses for emotional insights"""
     print("\n💭 Analyzing open-ended responses...")
+    matcher = matcher or theme_matcher()
     
     # Key open-ended columns
     oe_columns = {
@@ -29,75 +37,63 @@ def analyze_open_ended_responses(df):
         'guilty_pleasures': 'Q16_Music_guilty_pleasure_text_OE'
     }
     
-    sentiment_insights = {}
+    columns = {response_type: open_ended_responses(df, column)
+               for response_type, column in oe_columns.items() if column in df.columns}
     
-    for response_type, column in oe_columns.items():
-        if column in df.columns:
-            responses = df[column].dropna()
-            responses = responses[responses != "Not sure"]
-            responses = responses[responses != "."]
-            
-            if len(responses) > 0:
-                sentiment_insights[response_type] = {
-                    'total_responses': len(responses),
-                    'sample_responses': responses.head(10).tolist(),
-                    'word_frequency': analyze_word_frequency(responses),
-                    'emotional_themes': extract_emotional_themes(responses)
-                }
-                
-                print(f"   {response_type}: {len(responses)} responses")
+    # Columns tokenized before (here or by the visualizations) come from the token cache
+    cached_terms = {}
+    if not refresh:
+        for response_type, responses in columns.items():
+            terms = load_term_matrix(responses, oe_columns[response_type])
+            if terms is not None:
+                cached_terms[response_type] = terms
+    
+    # Columns are split into row shards and analyzed across the worker pool,
+    # then merged in shard order (identical to a serial run)
+    results = analyze_columns(columns, matcher, n_jobs=n_jobs, shard_rows=shard_rows, terms=cached_terms)
+    
+    sentiment_insights = {}
+    for response_type, result in results.items():
+        # Tokenized once; every word count below reads this matrix
+        terms = result['terms']
+        if response_type not in cached_terms:
+            save_term_matrix(terms, columns[response_type], oe_columns[response_type])
+        sentiment_insights[response_type] = {
+            'total_responses': result['total_responses'],
+            'sample_responses': result['sample_responses'],
+            'word_frequency': analyze_word_frequency(columns[response_type], terms),
+            'group_word_frequency': analyze_group_term_counts(df, terms),
+            'emotional_themes': matcher.summarize(result['theme_counts'], result['total_responses'])
+        }
+        
+        print(f"   {response_type}: {result['total_responses']} responses")
     
     return sentiment_insights
 
-def analyze_word_frequency(responses):
+def analyze_word_frequency(responses, terms=None):
     """Analyze word frequency in responses"""
-    # Combine all responses
-    all_text = ' '.join(responses.astype(str))
-    
-    # Clean text
-    all_text = re.sub(r'[^\w\s]', ' ', all_text.lower())
-    words = all_text.split()
-    
-    # Remove common stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their'}
-    
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 2]
-    
-    # Count frequency
-    word_freq = Counter(filtered_words)
-    
-    return dict(word_freq.most_common(20))
+    # Top words of the column's document-term matrix
+    terms = terms or build_term_matrix(responses)
+    return terms.top_terms(20)
 
-def extract_emotional_themes(responses):
-    """Extract emotional themes from responses"""
-    # Define emotional keywords
-    emotional_keywords = {
-        'love': ['love', 'loved', 'loving', 'adore', 'adored', 'passion', 'passionate'],
-        'sadness': ['sad', 'cry', 'cried', 'tears', 'heartbreak', 'lonely', 'melancholy'],
-        'joy': ['happy', 'joy', 'celebration', 'dance', 'dancing', 'fun', 'excitement'],
-        'nostalgia': ['remember', 'memory', 'childhood', 'past', 'nostalgic', 'throwback'],
-        'empowerment': ['strong', 'power', 'empower', 'confident', 'courage', 'brave'],
-        'peace': ['calm', 'peaceful', 'serene', 'relax', 'chill', 'zen', 'tranquil']
+def analyze_group_term_counts(df, terms, n=10):
+    """Top words of each persona and demographic group, from the same term matrix"""
+    group_columns = {
+        'persona': 'persona_cluster',
+        'age_group': 'AgeGroup_Broad',
+        'province': 'Province'
     }
     
-    emotional_themes = {}
-    
-    for emotion, keywords in emotional_keywords.items():
-        count = 0
-        for response in responses:
-            response_lower = str(response).lower()
-            for keyword in keywords:
-                if keyword in response_lower:
-                    count += 1
-                    break
-        
-        if count > 0:
-            emotional_themes[emotion] = {
-                'count': count,
-                'percentage': (count / len(responses)) * 100
-            }
-    
-    return emotional_themes
+    return {
+        group: terms.top_terms_by_group(df.loc[terms.index, column], n)
+        for group, column in group_columns.items() if column in df.columns
+    }
+
+def extract_emotional_themes(responses, matcher=None):
+    """Extract emotional themes from responses"""
+    # One scan per response for every emotion's keywords (see emotion_lexicon.json)
+    matcher = matcher or theme_matcher()
+    return matcher.themes(responses)
 
 def analyze_music_bingo_sentiment(df):
     """Analyze sentiment patterns in music bingo activities"""
@@ -118,7 +114,7 @@ def analyze_music_bingo_sentiment(df):
     
     for i, col in enumerate(bingo_columns[:7]):
         if col in df.columns:
-            count = df[col].notna().sum()
+            count = int(df[col].notna().sum())
             percentage = (count / len(df)) * 100
             
             bingo_sentiment[bingo_activities[i]] = {
@@ -156,7 +152,8 @@ def analyze_demographic_sentiment_patterns(df):
                 age_data = df[df['AgeGroup_Broad'] == age_group]
                 
                 # Analyze AI attitudes by age
-                ai_attitudes = age_data['Q10_Songs_by_AI'].value_counts().to_dict()
+                ai_counts = age_data['Q10_Songs_by_AI'].value_counts()
+                ai_attitudes = ai_counts[ai_counts > 0].to_dict()
                 
                 age_sentiment[age_group] = {
                     'ai_attitudes': ai_attitudes,
@@ -174,7 +171,8 @@ def analyze_demographic_sentiment_patterns(df):
             province_data = df[df['Province'] == province]
             
             # Analyze music preferences by province
-            music_prefs = province_data['Q9_Music_preference_these_days'].value_counts().to_dict()
+            pref_counts = province_data['Q9_Music_preference_these_days'].value_counts()
+            music_prefs = pref_counts[pref_counts > 0].to_dict()
             
             province_sentiment[province] = {
                 'music_preferences': music_prefs,
@@ -250,34 +248,59 @@ def export_sentiment_data(sentiment_data, insights):
     
     print(f"   ✅ Sentiment data exported to: {insights_file}")
 
-def main():
+def main(trace_file=None, lexicon_file=None, n_jobs=1, shard_rows=DEFAULT_SHARD_ROWS, refresh=False):
     """Main sentiment analysis pipeline"""
     print("💭 Enhanced Sentiment Analysis for Canadian Music DNA")
     print("="*60)
+    trace = StageTrace('sentiment_enhanced')
     
     # Load data
-    df = load_data()
+    with trace.stage('load') as stage:
+        df = load_data()
+        stage['rows'] = n_rows = len(df)
     
     # Analyze open-ended responses
-    sentiment_data = analyze_open_ended_responses(df)
+    with trace.stage('open_ended', rows=n_rows):
+        sentiment_data = analyze_open_ended_responses(df, theme_matcher(lexicon_file), n_jobs=n_jobs,
+                                                      shard_rows=shard_rows, refresh=refresh)
     
     # Analyze music bingo sentiment
-    sentiment_data['bingo_sentiment'] = analyze_music_bingo_sentiment(df)
+    with trace.stage('bingo', rows=n_rows):
+        sentiment_data['bingo_sentiment'] = analyze_music_bingo_sentiment(df)
     
     # Analyze demographic patterns
-    sentiment_data['demographic_patterns'] = analyze_demographic_sentiment_patterns(df)
+    with trace.stage('demographics', rows=n_rows):
+        sentiment_data['demographic_patterns'] = analyze_demographic_sentiment_patterns(df)
     
     # Generate insights
-    insights = generate_sentiment_insights(sentiment_data)
+    with trace.stage('insights'):
+        insights = generate_sentiment_insights(sentiment_data)
     
     # Export data
-    export_sentiment_data(sentiment_data, insights)
+    with trace.stage('export'):
+        export_sentiment_data(sentiment_data, insights)
     
     print("\n" + "="*60)
     print("✅ Enhanced sentiment analysis complete!")
     print(f"   Generated {len(insights)} key insights")
     print("   Sentiment data ready for frontend integration")
     print("="*60)
+    
+    trace.summary()
+    print(f"   Stage trace written to: {trace.write(trace_file)}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Canadian Music DNA sentiment analysis")
+    parser.add_argument('--lexicon', type=Path, default=None,
+                        help="emotion lexicon JSON of {emotion: [keywords]} (defaults to emotion_lexicon.json)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="worker processes for the open-ended analysis (-1 = all cores)")
+    parser.add_argument('--shard-rows', type=int, default=DEFAULT_SHARD_ROWS,
+                        help="responses per open-ended analysis shard")
+    parser.add_argument('--refresh', action='store_true',
+                        help="tokenize every open-ended column again instead of reusing the token cache")
+    parser.add_argument('--trace', type=Path, default=None,
+                        help="where to write the per-stage Chrome trace (default data/traces/)")
+    args = parser.parse_args()
+    main(trace_file=args.trace, lexicon_file=args.lexicon, n_jobs=args.jobs, shard_rows=args.shard_rows,
+         refresh=args.refresh)
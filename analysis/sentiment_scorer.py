@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Local lexicon sentiment scorer for the open-ended answers
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+The raw survey ships a <column>_sentiment label (POSITIVE, NEGATIVE,
+NEUTRAL or MIXED) and a <column>_sentiment_percentage confidence (0-1)
+for every open-ended answer, computed by an external service. This module
+scores new or synthetic answers offline and fills the same two columns.
+
+Scoring follows the VADER rules on a VADER-format lexicon (one token per
+line, tab-separated, with the mean valence from -4 to +4 in the second
+field; further fields are ignored, so the original vader_lexicon.txt can
+be passed with --lexicon). sentiment_lexicon.txt next to this file is a
+small lexicon for the survey's vocabulary. Each word's valence is:
+
+- emphasized by ALL CAPS when the rest of the answer is not in capitals;
+- raised or lowered by booster words ("very", "barely") up to three
+  words before it;
+- flipped and damped by a negation ("not", "never", "don't") up to three
+  words before it;
+- halved before "but" and increased by half after it.
+
+The answer's sum, plus an exclamation-mark bonus, is squashed into a
+compound score in [-1, 1]. Answers with a compound of 0.05 or more are
+POSITIVE and -0.05 or less NEGATIVE, unless their positive and negative
+words carry comparable weight (MIXED); the rest are NEUTRAL. The confidence is
+0.5 + |compound| / 2 for POSITIVE and NEGATIVE, the share of neutral words
+for NEUTRAL, and the share of sentiment-bearing words for MIXED.
+
+A batch of answers is split into words in one call. String work
+(punctuation, case, lexicon and booster lookups) runs once per distinct
+word, through arrays indexed by vocabulary position. The per-word and
+per-answer rules are then NumPy operations over one array element per
+word. Repeated answers are only scored once.
+
+These labels are not equivalent to the shipped ones. Re-scoring the raw
+survey with the bundled lexicon agrees with the shipped label on about
+40% of Q5_Music_formal_change_impact answers and 67% of
+Q18_Life_theme_song answers (Q5: 150 POSITIVE against 466 shipped), so
+filled columns should not be mixed with the original ones in comparisons.
+
+Lexicon tokens are matched lowercased; case variants and repeated entries
+of a token are merged into one with their mean valence.
+
+Usage:
+    python sentiment_scorer.py --input survey_1m.csv --output survey_1m_scored.csv
+    python sentiment_scorer.py --input survey.parquet --output scored.parquet --overwrite
+"""
+
+import argparse
+import string
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - CSV input and output do not need pyarrow
+    pa = None
+    pq = None
+
+from survey_cache import RAW_DATA_PATH
+
+SENTIMENT_LEXICON_FILE = Path(__file__).parent / "sentiment_lexicon.txt"
+SENTIMENT_SUFFIX = '_sentiment'
+CONFIDENCE_SUFFIX = '_sentiment_percentage'
+DEFAULT_BATCH_SIZE = 100000
+DEFAULT_CHUNK_ROWS = 1000000
+
+# VADER constants
+BOOSTER_INCREMENT = 0.293
+CAPS_INCREMENT = 0.733
+NEGATION_SCALAR = -0.74
+EXCLAMATION_INCREMENT = 0.292
+MAX_EXCLAMATIONS = 4
+NORMALIZATION_ALPHA = 15
+BOOSTER_DISTANCE_SCALARS = (1.0, 0.95, 0.9)
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+# An answer is MIXED when its weaker side (positive or negative share) is
+# at least MIXED_SHARE and at least MIXED_RATIO of the stronger side
+MIXED_SHARE = 0.15
+MIXED_RATIO = 0.5
+
+NEGATIONS = {
+    'aint', 'arent', 'cannot', 'cant', 'couldnt', 'darent', 'didnt', 'doesnt', 'dont', 'hadnt', 'hasnt',
+    'havent', 'isnt', 'mightnt', 'mustnt', 'neither', 'neednt', 'never', 'none', 'nope', 'nor', 'not',
+    'nothing', 'nowhere', 'oughtnt', 'shant', 'shouldnt', 'wasnt', 'werent', 'without', 'wont', 'wouldnt',
+    'rarely', 'seldom', 'despite'
+}
+
+BOOSTERS = {
+    'absolutely': BOOSTER_INCREMENT, 'amazingly': BOOSTER_INCREMENT, 'completely': BOOSTER_INCREMENT,
+    'deeply': BOOSTER_INCREMENT, 'especially': BOOSTER_INCREMENT, 'extremely': BOOSTER_INCREMENT,
+    'fully': BOOSTER_INCREMENT, 'greatly': BOOSTER_INCREMENT, 'highly': BOOSTER_INCREMENT,
+    'incredibly': BOOSTER_INCREMENT, 'most': BOOSTER_INCREMENT, 'particularly': BOOSTER_INCREMENT,
+    'quite': BOOSTER_INCREMENT, 'really': BOOSTER_INCREMENT, 'so': BOOSTER_INCREMENT,
+    'super': BOOSTER_INCREMENT, 'totally': BOOSTER_INCREMENT, 'truly': BOOSTER_INCREMENT,
+    'utterly': BOOSTER_INCREMENT, 'very': BOOSTER_INCREMENT,
+    'barely': -BOOSTER_INCREMENT, 'hardly': -BOOSTER_INCREMENT, 'kinda': -BOOSTER_INCREMENT,
+    'less': -BOOSTER_INCREMENT, 'little': -BOOSTER_INCREMENT, 'marginally': -BOOSTER_INCREMENT,
+    'occasionally': -BOOSTER_INCREMENT, 'partly': -BOOSTER_INCREMENT, 'scarcely': -BOOSTER_INCREMENT,
+    'slightly': -BOOSTER_INCREMENT, 'somewhat': -BOOSTER_INCREMENT, 'sorta': -BOOSTER_INCREMENT
+}
+
+PUNCTUATION = string.punctuation + '“”‘’…'
+SEPARATOR = '\x00'
+
+
+def load_sentiment_lexicon(path=None):
+    """Tokens and mean valences of a VADER-format lexicon (case variants and repeats averaged)"""
+    tokens = []
+    valences = []
+    with open(path or SENTIMENT_LEXICON_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            tokens.append(fields[0].lower())
+            valences.append(float(fields[1]))
+    # Tokens are matched lowercased, so "Good" and "good" are one entry
+    merged = pd.Series(valences, index=tokens, dtype=np.float64).groupby(level=0, sort=False).mean()
+    return merged.index.tolist(), merged.to_numpy()
+
+
+def same_row_shift(values, rows, k, fill):
+    """values[i - k] where token i - k is in the same answer as token i, else fill"""
+    shifted = np.full(len(values), fill, dtype=values.dtype)
+    if k < len(values):
+        same = rows[k:] == rows[:-k]
+        shifted[k:] = np.where(same, values[:-k], fill)
+    return shifted
+
+
+class LexiconScorer:
+    """VADER-style scorer with array-backed lexicon lookups"""
+    
+    def __init__(self, tokens, valences):
+        # Position len(vocabulary) holds the zero valence of unknown tokens
+        self.vocabulary = pd.Index(tokens)
+        if not self.vocabulary.is_unique:
+            duplicates = self.vocabulary[self.vocabulary.duplicated()].unique().tolist()
+            raise ValueError(f"Lexicon tokens are listed more than once: {duplicates[:5]}")
+        self.valences = np.append(np.asarray(valences, dtype=np.float64), 0.0)
+        self.boosters = pd.Index(list(BOOSTERS))
+        self.booster_values = np.append(np.array(list(BOOSTERS.values())), 0.0)
+    
+    def lookup(self, words, index, table):
+        """Table values for words (the last table entry for words not in index)"""
+        positions = index.get_indexer(words)
+        positions[positions < 0] = len(table) - 1
+        return table[positions]
+    
+    def word_features(self, words):
+        """Per distinct word: valence, booster value and negation, 'but', ALL CAPS and empty flags"""
+        stripped = pd.Series(words, dtype=object).str.strip(PUNCTUATION)
+        lower = stripped.str.lower()
+        bare = lower.str.replace("'", '', regex=False)
+        return {
+            'valence': self.lookup(lower, self.vocabulary, self.valences),
+            'boost': self.lookup(bare, self.boosters, self.booster_values),
+            'negation': (bare.isin(NEGATIONS) | lower.str.contains("n't", regex=False)).to_numpy(),
+            'but': (bare == 'but').to_numpy(),
+            'upper': stripped.str.isupper().to_numpy(),
+            'exclamations': pd.Series(words, dtype=object).str.count('!').to_numpy(),
+            'empty': (stripped == '').to_numpy()
+        }
+    
+    def score_distinct(self, texts):
+        """Compound, positive, negative and neutral scores of distinct answers"""
+        texts = [str(text).replace(SEPARATOR, ' ') for text in texts]
+        n_texts = len(texts)
+    
+        # Split all answers in one call; a separator word before every answer
+        # numbers the words by answer, and string work runs once per distinct word
+        tokens = (f'{SEPARATOR} ' + f' {SEPARATOR} '.join(texts)).replace('’', "'").split() if texts else []
+        codes, words = pd.factorize(np.array(tokens, dtype=object))
+        is_separator = codes == 0
+        features = self.word_features(words)
+        keep = ~is_separator & ~features['empty'][codes]
+        rows = (np.cumsum(is_separator) - 1)[keep]
+        codes = codes[keep]
+    
+        valence = features['valence'][codes]
+        sign = np.sign(valence)
+    
+        # ALL CAPS words are emphasized when the answer mixes case
+        upper = features['upper'][codes]
+        n_upper = np.bincount(rows, weights=upper, minlength=n_texts)
+        n_words = np.bincount(rows, minlength=n_texts)
+        mixed_case = (n_upper > 0) & (n_upper < n_words)
+        valence = valence + sign * CAPS_INCREMENT * (upper & mixed_case[rows])
+    
+        # Boosters and negations in the three preceding words
+        boost = features['boost'][codes]
+        negation = features['negation'][codes]
+        boost_total = np.zeros(len(valence))
+        negated = np.zeros(len(valence), dtype=bool)
+        for k, scalar in enumerate(BOOSTER_DISTANCE_SCALARS, start=1):
+            boost_total += same_row_shift(boost, rows, k, 0.0) * scalar
+            negated |= same_row_shift(negation, rows, k, False)
+        valence = np.where(valence != 0, valence + sign * boost_total, 0.0)
+        valence = np.where(negated, valence * NEGATION_SCALAR, valence)
+    
+        # "but" shifts the weight to the clause after it
+        is_but = features['but'][codes]
+        buts = np.cumsum(is_but)
+        first_word = np.searchsorted(rows, rows)
+        buts_so_far = buts - (buts[first_word] - is_but[first_word])
+        has_but = np.bincount(rows, weights=is_but, minlength=n_texts) > 0
+        valence = np.where(has_but[rows] & (buts_so_far == 0), valence * 0.5, valence)
+        valence = np.where((buts_so_far > 0) & ~is_but, valence * 1.5, valence)
+    
+        total = np.bincount(rows, weights=valence, minlength=n_texts)
+        exclamations = np.bincount(rows, weights=features['exclamations'][codes], minlength=n_texts)
+        total = total + np.sign(total) * np.minimum(exclamations, MAX_EXCLAMATIONS) * EXCLAMATION_INCREMENT
+        compound = np.clip(total / np.sqrt(total * total + NORMALIZATION_ALPHA), -1.0, 1.0)
+    
+        # VADER's proportions: sentiment words count their valence plus one
+        positive = np.bincount(rows, weights=np.where(valence > 0, valence + 1, 0.0), minlength=n_texts)
+        negative = np.bincount(rows, weights=np.where(valence < 0, 1 - valence, 0.0), minlength=n_texts)
+        neutral = np.bincount(rows, weights=valence == 0, minlength=n_texts)
+        mass = positive + negative + neutral
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shares = [np.where(mass > 0, part / mass, default)
+                      for part, default in ((positive, 0.0), (negative, 0.0), (neutral, 1.0))]
+        return pd.DataFrame({'compound': compound, 'positive': shares[0], 'negative': shares[1],
+                             'neutral': shares[2]})
+    
+    def polarity_scores(self, responses, batch_size=DEFAULT_BATCH_SIZE):
+        """Compound, positive, negative and neutral scores per response"""
+        codes, uniques = pd.factorize(pd.Series(responses))
+        batches = [self.score_distinct(uniques[start:start + batch_size])
+                   for start in range(0, len(uniques), batch_size)]
+        scores = pd.concat(batches, ignore_index=True) if batches else self.score_distinct([])
+        # Missing answers (code -1) get NaN scores from the row appended last
+        scores = pd.concat([scores, pd.DataFrame(np.nan, index=[len(scores)], columns=scores.columns)])
+        codes = np.where(codes < 0, len(scores) - 1, codes)
+        return scores.iloc[codes].set_index(pd.Series(responses).index)
+    
+    def label(self, responses, batch_size=DEFAULT_BATCH_SIZE):
+        """Sentiment label and confidence per response, in the survey's schema"""
+        scores = self.polarity_scores(responses, batch_size)
+        compound = scores['compound'].to_numpy()
+        positive = scores['positive'].to_numpy()
+        negative = scores['negative'].to_numpy()
+    
+        weaker = np.minimum(positive, negative)
+        mixed = (weaker >= MIXED_SHARE) & (weaker >= MIXED_RATIO * np.maximum(positive, negative))
+        conditions = [mixed, compound >= POSITIVE_THRESHOLD, compound <= NEGATIVE_THRESHOLD, ~np.isnan(compound)]
+        labels = np.select(conditions, ['MIXED', 'POSITIVE', 'NEGATIVE', 'NEUTRAL'], default=None)
+        confidence = np.select(conditions[:3], [positive + negative, 0.5 + np.abs(compound) / 2,
+                                                0.5 + np.abs(compound) / 2],
+                               default=scores['neutral'].to_numpy())
+        return pd.DataFrame({'sentiment': labels, 'percentage': confidence}, index=scores.index)
+
+
+def scored_columns(columns):
+    """Open-ended columns that have a sentiment label column next to them"""
+    columns = list(columns)
+    return [col for col in columns if col + SENTIMENT_SUFFIX in columns]
+
+
+def score_survey(df, scorer, overwrite=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Fill the _sentiment and _sentiment_percentage columns (only missing ones unless overwrite)"""
+    df = df.copy()
+    for col in scored_columns(df.columns):
+        label_col, confidence_col = col + SENTIMENT_SUFFIX, col + CONFIDENCE_SUFFIX
+        # Labels are text in every chunk, even one with no label yet
+        df[label_col] = df[label_col].astype(object)
+        todo = df[col].notna()
+        if not overwrite:
+            todo &= df[label_col].isna()
+        if not todo.any():
+            continue
+    
+        scores = scorer.label(df.loc[todo, col], batch_size)
+        df.loc[todo, label_col] = scores['sentiment']
+        if confidence_col in df.columns:
+            df.loc[todo, confidence_col] = scores['percentage']
+    return df
+
+
+def csv_dtypes(input_file, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """One dtype per CSV column that holds for every chunk (float64 for int and float, object otherwise)"""
+    dtypes = {}
+    for chunk in pd.read_csv(input_file, chunksize=chunk_rows):
+        for col, dtype in chunk.dtypes.items():
+            seen = dtypes.setdefault(col, dtype)
+            if seen == dtype:
+                continue
+            numeric = all(pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d)
+                          for d in (seen, dtype))
+            dtypes[col] = np.dtype('float64') if numeric else np.dtype(object)
+    return dtypes
+
+
+def read_chunks(input_file, chunk_rows=DEFAULT_CHUNK_ROWS, dtype=None):
+    """Yield a CSV or Parquet survey file in chunks of rows"""
+    if Path(input_file).suffix == '.parquet':
+        if pq is None:
+            raise ImportError("Parquet input requires pyarrow")
+        for batch in pq.ParquetFile(input_file).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_file, chunksize=chunk_rows, dtype=dtype)
+
+
+def parquet_schema(table):
+    """Writer schema from the first chunk, with text for columns that are empty in it"""
+    return pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                      for field in table.schema], metadata=table.schema.metadata)
+
+
+def main(output, input_file=None, lexicon_file=None, overwrite=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Score a survey file's open-ended answers and write it with the sentiment columns filled"""
+    input_file = Path(input_file or RAW_DATA_PATH)
+    output_file = Path(output)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    if output_file.suffix == '.parquet' and pq is None:
+        raise ImportError("Parquet output requires pyarrow")
+    scorer = LexiconScorer(*load_sentiment_lexicon(lexicon_file))
+    print(f"Scoring {input_file.name} with {len(scorer.vocabulary):,} lexicon entries...")
+    
+    # A Parquet file has one schema, so every CSV chunk is read with the same dtypes
+    dtype = None
+    if output_file.suffix == '.parquet' and input_file.suffix != '.parquet':
+        dtype = csv_dtypes(input_file, chunk_rows)
+    
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    writer = None
+    n_rows = 0
+    try:
+        for index, chunk in enumerate(read_chunks(input_file, chunk_rows, dtype)):
+            chunk = score_survey(chunk, scorer, overwrite=overwrite)
+            if output_file.suffix == '.parquet':
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_file, parquet_schema(table), compression='zstd')
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(tmp_file, mode='w' if index == 0 else 'a', header=index == 0, index=False,
+                             encoding='utf-8')
+            n_rows += len(chunk)
+            print(f"   {n_rows:,} rows")
+    except BaseException:
+        # Leave no half-written file behind
+        if writer is not None:
+            writer.close()
+        tmp_file.unlink(missing_ok=True)
+        raise
+    if writer is not None:
+        writer.close()
+    tmp_file.replace(output_file)
+    print(f"Scored survey written to: {output_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the open-ended sentiment columns with a local lexicon scorer")
+    parser.add_argument('--input', type=Path, default=None,
+                        help="survey CSV or Parquet file (defaults to music_survey_data.csv)")
+    parser.add_argument('--output', type=Path, required=True, help="output .csv or .parquet file")
+    parser.add_argument('--lexicon', type=Path, default=None,
+                        help="VADER-format lexicon, e.g. vader_lexicon.txt (defaults to sentiment_lexicon.txt)")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="rescore every answer instead of only those without a sentiment")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows read, scored and written per chunk")
+    args = parser.parse_args()
+    main(output=args.output, input_file=args.input, lexicon_file=args.lexicon, overwrite=args.overwrite,
+         chunk_rows=args.chunk_rows)
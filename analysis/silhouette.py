@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Memory-bounded silhouette scoring for persona clustering
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+sklearn's silhouette_score needs every pairwise distance, which stops
+scaling at around 100k respondents. Here distances are streamed in fixed
+row x column blocks and reduced to per-cluster distance sums on the fly:
+
+- 'exact' scores every respondent against the full dataset;
+- 'sampled' scores a stratified sample of respondents (still against the
+  full dataset) and reports a confidence interval for the mean.
+
+Per-respondent values come back as float32 together with the nearest
+other cluster, so respondents sitting between personas can be flagged.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import norm
+from sklearn.metrics.pairwise import euclidean_distances
+
+SILHOUETTE_MODES = ('exact', 'sampled')
+DEFAULT_BLOCK_SIZE = 2048
+DEFAULT_SAMPLE_SIZE = 10000
+SILHOUETTE_SAMPLES_FILE = Path(__file__).parent.parent / "data" / "processed" / "silhouette_samples.parquet"
+
+
+def cluster_distance_sums(X, labels, rows, n_clusters, block_size=DEFAULT_BLOCK_SIZE):
+    """Sum the distances from each selected row to every cluster, block by block"""
+    n_samples = X.shape[0]
+    sums = np.zeros((len(rows), n_clusters), dtype=np.float64)
+
+    for r0 in range(0, len(rows), block_size):
+        row_idx = rows[r0:r0 + block_size]
+        X_rows = X[row_idx]
+        for c0 in range(0, n_samples, block_size):
+            c1 = min(c0 + block_size, n_samples)
+            distances = euclidean_distances(X_rows, X[c0:c1])
+
+            # Remove rounding noise on self-distances
+            own = (row_idx >= c0) & (row_idx < c1)
+            distances[np.flatnonzero(own), row_idx[own] - c0] = 0.0
+
+            membership = sparse.csr_matrix(
+                (np.ones(c1 - c0), (np.arange(c1 - c0), labels[c0:c1])),
+                shape=(c1 - c0, n_clusters)
+            )
+            sums[r0:r0 + len(row_idx)] += distances @ membership
+    return sums
+
+
+def silhouette_values(X, labels, rows=None, block_size=DEFAULT_BLOCK_SIZE):
+    """Silhouette value and nearest other cluster for the selected rows"""
+    labels = np.asarray(labels)
+    rows = np.arange(X.shape[0]) if rows is None else np.asarray(rows)
+    n_clusters = int(labels.max()) + 1
+    cluster_sizes = np.bincount(labels, minlength=n_clusters)
+
+    sums = cluster_distance_sums(X, labels, rows, n_clusters, block_size=block_size)
+    own = labels[rows]
+    own_size = cluster_sizes[own]
+
+    # Mean distance to the respondent's own cluster (excluding itself)
+    a = sums[np.arange(len(rows)), own] / np.maximum(own_size - 1, 1)
+
+    # Mean distance to the nearest other cluster
+    with np.errstate(divide='ignore', invalid='ignore'):
+        other = sums / cluster_sizes
+    other[np.arange(len(rows)), own] = np.inf
+    other[:, cluster_sizes == 0] = np.inf
+    neighbors = other.argmin(axis=1)
+    b = other[np.arange(len(rows)), neighbors]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = (b - a) / np.maximum(a, b)
+    # Singleton clusters score 0, as in sklearn
+    values[(own_size <= 1) | ~np.isfinite(values)] = 0.0
+    return values, neighbors
+
+
+def stratified_rows(labels, sample_size, random_state=42):
+    """Draw a per-cluster proportional sample of row indices"""
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(random_state)
+    n_samples = len(labels)
+    if sample_size >= n_samples:
+        return np.arange(n_samples)
+
+    rows = []
+    for cluster in np.unique(labels):
+        members = np.flatnonzero(labels == cluster)
+        take = max(2, int(round(sample_size * len(members) / n_samples)))
+        rows.append(rng.choice(members, size=min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(rows))
+
+
+def silhouette_report(X, labels, mode='exact', sample_size=DEFAULT_SAMPLE_SIZE,
+                      confidence=0.95, block_size=DEFAULT_BLOCK_SIZE, random_state=42):
+    """Silhouette mean with a confidence interval and per-respondent values"""
+    if mode not in SILHOUETTE_MODES:
+        raise ValueError(f"Unknown silhouette mode '{mode}', expected one of {SILHOUETTE_MODES}")
+
+    labels = np.asarray(labels)
+    if mode == 'sampled':
+        rows = stratified_rows(labels, sample_size, random_state=random_state)
+    else:
+        rows = np.arange(len(labels))
+    values, neighbors = silhouette_values(X, labels, rows, block_size=block_size)
+
+    # Stratified estimate of the mean; fully scored strata add no variance
+    population = np.bincount(labels)
+    sampled_labels = labels[rows]
+    mean = 0.0
+    variance = 0.0
+    for cluster in np.flatnonzero(population):
+        stratum = values[sampled_labels == cluster]
+        weight = population[cluster] / len(labels)
+        mean += weight * stratum.mean()
+        if 1 < len(stratum) < population[cluster]:
+            correction = 1 - len(stratum) / population[cluster]
+            variance += weight ** 2 * correction * stratum.var(ddof=1) / len(stratum)
+
+    margin = norm.ppf(0.5 + confidence / 2) * np.sqrt(variance)
+    return {
+        'mode': mode,
+        'mean': float(mean),
+        'ci_low': float(mean - margin),
+        'ci_high': float(mean + margin),
+        'confidence': confidence,
+        'n_scored': int(len(rows)),
+        'rows': rows,
+        'values': values.astype(np.float32),
+        'neighbors': neighbors
+    }
+
+
+def export_silhouette_samples(report, labels, ids=None, output_file=SILHOUETTE_SAMPLES_FILE):
+    """Write per-respondent silhouette values (float32) for the scored rows"""
+    rows = report['rows']
+    samples = pd.DataFrame({
+        'row': rows,
+        'persona_cluster': np.asarray(labels)[rows],
+        'neighbor_cluster': report['neighbors'],
+        'silhouette': report['values']
+    })
+    if ids is not None:
+        samples.insert(0, 'participant_id', np.asarray(ids)[rows])
+
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    samples.to_parquet(output_file, index=False)
+    return output_file
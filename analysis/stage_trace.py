@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and memory trace for the analysis entry points
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Every entry point wraps its stages in trace.stage(...), which records:
+
+- wall time and CPU time (all threads of the process);
+- peak RSS during the stage. On Linux the kernel's high-water mark is
+  reset at the start of each stage; elsewhere it is the process peak so
+  far. Without the resource module (Windows) it is left out;
+- the number of rows the stage handled.
+
+The trace is written in the Chrome trace event format, so it opens in
+chrome://tracing, Perfetto (ui.perfetto.dev) or speedscope. Stages are
+complete ("X") events with the measurements in their args, and RSS is a
+counter ("C") track.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows has no resource module
+    resource = None
+
+TRACE_DIR = Path(__file__).parent.parent / "data" / "traces"
+PROC_STATUS = Path("/proc/self/status")
+PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def read_status_mb(field):
+    """A memory field (e.g. VmHWM) of /proc/self/status in MB, or None"""
+    try:
+        with open(PROC_STATUS, 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """Peak resident set size since the last reset (or process start)"""
+    peak = read_status_mb('VmHWM')
+    if peak is not None or resource is None:
+        return peak
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 1024
+
+
+def current_rss_mb():
+    """Current resident set size, where the platform reports it"""
+    return read_status_mb('VmRSS')
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter (Linux only); returns whether it worked"""
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class StageTrace:
+    """Collects per-stage measurements and writes them as a Chrome trace
+    
+    With enabled=False, stage() still yields a record but measures nothing,
+    so library functions can be traced only when an entry point asks.
+    """
+    
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.events = []
+        self.stages = []
+        self._open = []
+        self._pid = os.getpid()
+        self._started = datetime.now(timezone.utc)
+        self._origin = time.perf_counter()
+    
+    def _now_us(self):
+        """Microseconds since the trace started"""
+        return (time.perf_counter() - self._origin) * 1e6
+    
+    def _rss_counter(self, ts):
+        """Record the current RSS on the counter track"""
+        rss = current_rss_mb()
+        if rss is not None:
+            self.events.append({'name': 'rss', 'ph': 'C', 'ts': ts, 'pid': self._pid,
+                                'args': {'rss_mb': round(rss, 1)}})
+    
+    @contextmanager
+    def stage(self, name, rows=None, **args):
+        """Measure a block; set record['rows'] inside it if the count is only known later"""
+        record = {'rows': rows, **args}
+        if not self.enabled:
+            yield record
+            return
+    
+        # A nested stage resets the kernel peak, so parents also keep their children's peaks
+        frame = {'child_peak': None}
+        self._open.append(frame)
+        resettable = reset_peak_rss()
+        start = self._now_us()
+        cpu_start = time.process_time()
+        self._rss_counter(start)
+        try:
+            yield record
+        finally:
+            end = self._now_us()
+            cpu_seconds = time.process_time() - cpu_start
+            self._open.pop()
+            peak = peak_rss_mb()
+            if peak is not None and frame['child_peak'] is not None:
+                peak = max(peak, frame['child_peak'])
+            if self._open and peak is not None:
+                parent = self._open[-1]
+                parent['child_peak'] = peak if parent['child_peak'] is None else max(parent['child_peak'], peak)
+    
+            measurements = {
+                'wall_seconds': round((end - start) / 1e6, 6),
+                'cpu_seconds': round(cpu_seconds, 6),
+                'peak_rss_mb': None if peak is None else round(peak, 1),
+                'peak_rss_scope': 'stage' if resettable else 'process',
+                **{key: value for key, value in record.items() if value is not None}
+            }
+            self.events.append({'name': name, 'cat': 'stage', 'ph': 'X', 'ts': start, 'dur': end - start,
+                                'pid': self._pid, 'tid': 0, 'args': measurements})
+            self._rss_counter(end)
+            self.stages.append({'stage': name, 'depth': len(self._open), 'start': start, **measurements})
+    
+    def summary(self):
+        """Print one line per stage"""
+        if not self.stages:
+            return
+        print("\nStage timings:")
+        for stage in sorted(self.stages, key=lambda s: s['start']):
+            line = f"   {'  ' * stage['depth']}{stage['stage']}: {stage['wall_seconds']:.2f}s wall, {stage['cpu_seconds']:.2f}s CPU"
+            if stage['peak_rss_mb'] is not None:
+                line += f", peak RSS {stage['peak_rss_mb']:.0f} MB"
+            if stage.get('rows') is not None:
+                line += f", {stage['rows']:,} rows"
+            print(line)
+    
+    def write(self, output_file=None):
+        """Write the Chrome trace JSON; returns its path (None when disabled)"""
+        if not self.enabled:
+            return None
+        output_file = Path(output_file or TRACE_DIR / f"{self.name}.trace.json")
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        trace = {
+            'traceEvents': [
+                {'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'args': {'name': self.name}},
+                *self.events
+            ],
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'entry_point': self.name,
+                'started': self._started.isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform()
+            }
+        }
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        return output_file
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Typed columnar cache for the raw music survey CSV
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+The first load parses music_survey_data.csv once and stores it as an
+uncompressed Arrow (Feather v2) file with categorical answer columns.
+Later loads memory-map that file and only re-parse the CSV when its
+SHA-256 no longer matches the hash recorded in the cache metadata. The
+CSV's size and modification time are recorded too, and the file is only
+re-hashed when one of them has changed.
+"""
+
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the cache is an optimisation only
+    pa = None
+    feather = None
+
+RAW_DATA_PATH = Path(__file__).parent.parent.parent / "vanai-hackathon-004-master" / "data" / "raw" / "music_survey_data.csv"
+CACHE_DIR = Path(__file__).parent.parent / "data" / "cache"
+CLUSTERED_DATA_FILE = Path(__file__).parent.parent / "data" / "processed" / "clustered_data.parquet"
+
+# Text columns whose share of distinct answers is below this ratio are stored
+# as categoricals; open-ended answers and ids stay plain strings.
+CATEGORICAL_MAX_UNIQUE_RATIO = 0.5
+
+HASH_METADATA_KEY = b"source_sha256"
+SIZE_METADATA_KEY = b"source_size"
+MTIME_METADATA_KEY = b"source_mtime_ns"
+HASH_BLOCK_SIZE = 1 << 20
+DEFAULT_CHUNK_ROWS = 100000
+
+
+def file_sha256(path):
+    """Hash a file in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stat(path):
+    """Size and modification time (ns) of a file, as stored in the cache metadata"""
+    stat = Path(path).stat()
+    return {SIZE_METADATA_KEY: str(stat.st_size).encode(), MTIME_METADATA_KEY: str(stat.st_mtime_ns).encode()}
+
+
+def cache_path_for(data_path):
+    """Location of the columnar cache for a raw CSV file"""
+    # Same-named CSVs in different directories get their own cache
+    path_digest = hashlib.sha256(str(Path(data_path).resolve()).encode('utf-8')).hexdigest()[:12]
+    return CACHE_DIR / f"{Path(data_path).stem}-{path_digest}.arrow"
+
+
+def to_categorical(df):
+    """Convert low-cardinality text columns to categoricals in place"""
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object and not pd.api.types.is_string_dtype(series.dtype):
+            continue
+        answers = series.dropna()
+        if len(answers) == 0:
+            continue
+        # Keep categories in first-seen order so value_counts ties stay stable
+        categories = answers.unique()
+        if len(categories) <= CATEGORICAL_MAX_UNIQUE_RATIO * len(answers):
+            df[col] = series.astype(pd.CategoricalDtype(categories))
+    return df
+
+
+def read_cache_metadata(cache_file):
+    """Return the schema metadata of a cache file, or None"""
+    try:
+        with pa.memory_map(str(cache_file), 'r') as source:
+            return pa.ipc.open_file(source).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def read_cached_hash(cache_file):
+    """Return the source hash stored in a cache file, or None"""
+    value = (read_cache_metadata(cache_file) or {}).get(HASH_METADATA_KEY)
+    return value.decode() if value else None
+
+
+def write_cache(table, cache_file, source_hash, source_stat):
+    """Write a table as the cache, recording the source's hash, size and mtime"""
+    metadata = dict(table.schema.metadata or {})
+    metadata[HASH_METADATA_KEY] = source_hash.encode()
+    metadata.update(source_stat)
+    table = table.replace_schema_metadata(metadata)
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix('.tmp')
+    feather.write_feather(table, str(tmp_file), compression='uncompressed')
+    tmp_file.replace(cache_file)
+
+
+def build_cache(data_path, cache_file, source_hash, source_stat):
+    """Parse the raw CSV once and write the typed columnar cache"""
+    print(f"Building columnar cache for {Path(data_path).name}...")
+    df = to_categorical(pd.read_csv(data_path))
+    write_cache(pa.Table.from_pandas(df, preserve_index=False), cache_file, source_hash, source_stat)
+    return df
+
+
+def stat_matches(metadata, source_stat):
+    """Whether cache metadata records the given source size and mtime"""
+    return metadata is not None and all(metadata.get(key) == value for key, value in source_stat.items())
+
+
+def iter_survey_chunks(data_path=None, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield the survey in chunks of rows without loading it whole
+    
+    Reads record batches of the memory-mapped columnar cache when it is current,
+    and streams the CSV otherwise.
+    """
+    data_path = Path(data_path) if data_path is not None else RAW_DATA_PATH
+    cache_file = cache_path_for(data_path)
+    if feather is not None and stat_matches(read_cache_metadata(cache_file), file_stat(data_path)):
+        with pa.memory_map(str(cache_file), 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for start in range(0, batch.num_rows, chunk_rows):
+                    yield batch.slice(start, chunk_rows).to_pandas()
+    else:
+        yield from pd.read_csv(data_path, usecols=columns, chunksize=chunk_rows)
+
+
+def load_survey_data(data_path=None, columns=None, refresh=False):
+    """Load the survey data, going through the columnar cache when possible"""
+    data_path = Path(data_path) if data_path is not None else RAW_DATA_PATH
+
+    if feather is None:
+        df = pd.read_csv(data_path, usecols=columns)
+        return to_categorical(df)
+
+    cache_file = cache_path_for(data_path)
+    source_stat = file_stat(data_path)
+    metadata = None if refresh else read_cache_metadata(cache_file)
+
+    # Same size and mtime as when the cache was written: skip hashing the CSV
+    if not stat_matches(metadata, source_stat):
+        source_hash = file_sha256(data_path)
+        cached_hash = metadata.get(HASH_METADATA_KEY) if metadata is not None else None
+        if cached_hash is None or cached_hash.decode() != source_hash:
+            df = build_cache(data_path, cache_file, source_hash, source_stat)
+            return df[columns] if columns is not None else df
+
+        # Touched but not changed: record the new size and mtime so later loads skip the hash
+        write_cache(feather.read_table(str(cache_file), memory_map=False), cache_file, source_hash, source_stat)
+
+    table = feather.read_table(str(cache_file), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def survey_data_hash(data_path=None):
+    """SHA-256 of the survey CSV (call after load_survey_data, which keeps the cached hash current)"""
+    data_path = Path(data_path) if data_path is not None else RAW_DATA_PATH
+    if feather is not None:
+        cached_hash = read_cached_hash(cache_path_for(data_path))
+        if cached_hash is not None:
+            return cached_hash
+    return file_sha256(data_path)
+
+
+def load_clustered_data(columns=None, data_path=None, clustered_file=CLUSTERED_DATA_FILE):
+    """Survey answers joined with the exported persona assignments on participant_id"""
+    assignments = pd.read_parquet(clustered_file)
+    if columns is not None:
+        columns = ['participant_id'] + [col for col in columns if col != 'participant_id']
+    df = load_survey_data(data_path, columns=columns)
+    return df.merge(assignments, on='participant_id', how='left')
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Schema-faithful synthetic survey generator for scale testing
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Learns the answer distributions of music_survey_data.csv and writes
+arbitrarily large datasets with the same columns, in the same order, with
+the same answer strings (emoji included) and open-ended text.
+
+Columns are generated in groups. Each group is drawn from one real
+respondent, so the columns inside a group keep their joint distribution,
+while separate groups are independent:
+
+- most questions are a group of one (their marginal distribution);
+- a group with 'given' is drawn from respondents who match an already
+  generated column, which reproduces joints such as age x discovery
+  (Q2) and age x AI attitude (Q10), and keeps Age and YOBClosed within
+  the generated age group;
+- every open-ended answer travels with its _sentiment and
+  _sentiment_percentage columns;
+- unique identifiers (participant_id, engagement_id, BrokerPanelId) are
+  fresh random UUIDs in the source's format.
+
+Generation works on integer codes in fixed-size chunks, so memory depends
+on --chunk-rows rather than --rows and 100M-row files stream to disk.
+
+Usage:
+    python synthetic_survey.py --rows 1000000 --output survey_1m.csv
+    python synthetic_survey.py --rows 100000000 --output survey_100m.parquet
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - CSV output does not need pyarrow
+    pa = None
+    pq = None
+
+from survey_cache import RAW_DATA_PATH
+
+DEFAULT_CHUNK_ROWS = 1000000
+
+# Columns drawn together from one real respondent, optionally matched on
+# a column generated earlier ('given')
+COLUMN_GROUPS = [
+    {'columns': ['AgeGroup_Broad']},
+    {'columns': ['Age', 'YOBClosed'], 'given': 'AgeGroup_Broad'},
+    {'columns': ['Q2_Discovering_music'], 'given': 'AgeGroup_Broad'},
+    {'columns': ['Q10_Songs_by_AI'], 'given': 'AgeGroup_Broad'},
+    {'columns': ['CMA', 'Province', 'Region']},
+    {'columns': ['engagement_started_EDT', 'engagement_completed_EDT']}
+]
+
+SENTIMENT_SUFFIXES = ('_sentiment', '_sentiment_percentage')
+
+# Hex digit positions in the 36-character UUID layout (8-4-4-4-12)
+UUID_HEX_POSITIONS = np.array([i for i in range(36) if i not in (8, 13, 18, 23)])
+# Nibbles holding the version (string position 14) and the variant (position 19)
+UUID_VERSION_NIBBLE = 12
+UUID_VARIANT_NIBBLE = 16
+
+
+def is_identifier(series):
+    """Text column with a distinct value for every respondent"""
+    return series.dtype == object and series.notna().all() and series.is_unique and len(series) > 1
+
+
+def identifier_format(series):
+    """Shared prefix and letter case of an identifier column"""
+    values = series.astype(str).tolist()
+    prefix = os.path.commonprefix(values)
+    suffix = values[0][len(prefix):]
+    return {'prefix': prefix, 'upper': suffix.upper() == suffix}
+
+
+def column_groups(columns, groups=COLUMN_GROUPS):
+    """Configured groups, open-ended answers with their sentiment columns, then single columns"""
+    columns = list(columns)
+    resolved = [{'columns': [col for col in group['columns'] if col in columns], 'given': group.get('given')}
+                for group in groups]
+    resolved = [group for group in resolved if group['columns']]
+    grouped = {col for group in resolved for col in group['columns']}
+    
+    for col in columns:
+        siblings = [col + suffix for suffix in SENTIMENT_SUFFIXES if col + suffix in columns]
+        if siblings and col not in grouped:
+            resolved.append({'columns': [col] + siblings, 'given': None})
+            grouped.update([col] + siblings)
+    
+    resolved.extend({'columns': [col], 'given': None} for col in columns if col not in grouped)
+    return resolved
+
+
+def fit_survey_model(df, groups=COLUMN_GROUPS):
+    """Learn every column's answers (as codes per real respondent) and the column groups"""
+    model = {'columns': list(df.columns), 'n_source': len(df), 'encodings': {}, 'identifiers': {}}
+    for col in df.columns:
+        series = df[col]
+        if is_identifier(series):
+            model['identifiers'][col] = identifier_format(series)
+            continue
+        codes, uniques = pd.factorize(series)
+        model['encodings'][col] = {'codes': codes.astype(np.int32), 'uniques': np.asarray(uniques),
+                                   'dtype': series.dtype}
+    
+    model['groups'] = [group for group in column_groups(df.columns, groups)
+                       if not set(group['columns']) & set(model['identifiers'])]
+    for group in model['groups']:
+        given = group['given']
+        if given is None:
+            continue
+        # Real respondents for every value of the conditioning column
+        given_codes = model['encodings'][given]['codes']
+        group['donors'] = {code: np.flatnonzero(given_codes == code) for code in np.unique(given_codes)}
+    return model
+
+
+def random_identifiers(rng, n_rows, prefix='', upper=False):
+    """Random version 4 UUIDs, built without a Python loop"""
+    alphabet = np.frombuffer(b'0123456789ABCDEF' if upper else b'0123456789abcdef', dtype=np.uint8)
+    nibbles = rng.integers(0, 16, size=(n_rows, 32), dtype=np.uint8)
+    # Version nibble 4 and variant bits 10 (8, 9, a or b), as in uuid.uuid4()
+    nibbles[:, UUID_VERSION_NIBBLE] = 4
+    nibbles[:, UUID_VARIANT_NIBBLE] = 8 | (nibbles[:, UUID_VARIANT_NIBBLE] & 3)
+    chars = np.full((n_rows, 36), ord('-'), dtype=np.uint8)
+    chars[:, UUID_HEX_POSITIONS] = alphabet[nibbles]
+    identifiers = chars.view('S36').ravel().astype('U36')
+    return np.char.add(prefix, identifiers) if prefix else identifiers
+
+
+def decode_column(encoding, source_rows):
+    """Column values for the drawn source respondents, in the source dtype"""
+    codes = encoding['codes'][source_rows]
+    uniques = encoding['uniques']
+    if encoding['dtype'] == object:
+        return pd.Categorical.from_codes(codes, categories=uniques)
+    if (codes < 0).any():
+        # Code -1 picks the appended NaN
+        return np.append(uniques.astype(np.float64), np.nan)[codes]
+    return uniques[codes]
+
+
+def sample_chunk(model, n_rows, rng):
+    """Generate one chunk of synthetic respondents"""
+    columns = {}
+    drawn = {}
+    for group in model['groups']:
+        given = group['given']
+        if given is None:
+            source_rows = rng.integers(0, model['n_source'], size=n_rows)
+        else:
+            # Draw each row's donor among respondents sharing its generated value
+            given_codes = model['encodings'][given]['codes'][drawn[given]]
+            source_rows = np.empty(n_rows, dtype=np.int64)
+            for code, donors in group['donors'].items():
+                rows = np.flatnonzero(given_codes == code)
+                source_rows[rows] = donors[rng.integers(0, len(donors), size=len(rows))]
+        for col in group['columns']:
+            drawn[col] = source_rows
+            columns[col] = decode_column(model['encodings'][col], source_rows)
+    
+    for col, fmt in model['identifiers'].items():
+        columns[col] = random_identifiers(rng, n_rows, **fmt)
+    return pd.DataFrame({col: columns[col] for col in model['columns']})
+
+
+def generate_chunks(model, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=42):
+    """Yield synthetic chunks; each chunk has its own seeded generator"""
+    for index, start in enumerate(range(0, n_rows, chunk_rows)):
+        rng = np.random.default_rng([seed, index])
+        yield sample_chunk(model, min(chunk_rows, n_rows - start), rng)
+
+
+def write_synthetic_survey(model, n_rows, output_file, chunk_rows=DEFAULT_CHUNK_ROWS, seed=42):
+    """Stream synthetic respondents to a CSV or Parquet file"""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    parquet = output_file.suffix == '.parquet'
+    if parquet and pq is None:
+        raise ImportError("Parquet output requires pyarrow")
+    
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+    writer = None
+    try:
+        for index, chunk in enumerate(generate_chunks(model, n_rows, chunk_rows, seed)):
+            if parquet:
+                # One row group per chunk; categorical answers become dictionary columns
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_file, table.schema, compression='zstd')
+                writer.write_table(table)
+            else:
+                chunk.to_csv(tmp_file, mode='w' if index == 0 else 'a', header=index == 0, index=False,
+                             encoding='utf-8')
+            print(f"   {min((index + 1) * chunk_rows, n_rows):,} / {n_rows:,} rows")
+    except BaseException:
+        # Leave no half-written file behind
+        if writer is not None:
+            writer.close()
+        tmp_file.unlink(missing_ok=True)
+        raise
+    if writer is not None:
+        writer.close()
+    tmp_file.replace(output_file)
+    return output_file
+
+
+def main(rows, output, data_path=None, chunk_rows=DEFAULT_CHUNK_ROWS, seed=42):
+    """Fit the survey model and write a synthetic dataset"""
+    data_path = data_path or RAW_DATA_PATH
+    print(f"Learning answer distributions from {Path(data_path).name}...")
+    model = fit_survey_model(pd.read_csv(data_path))
+    joint = [group for group in model['groups'] if len(group['columns']) > 1 or group['given']]
+    print(f"   {len(model['columns'])} columns, {len(joint)} joint groups, "
+          f"{len(model['identifiers'])} identifier columns")
+    
+    print(f"Generating {rows:,} synthetic respondents...")
+    output_file = write_synthetic_survey(model, rows, output, chunk_rows, seed)
+    print(f"Synthetic survey written to: {output_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic music survey with the real schema")
+    parser.add_argument('--rows', type=int, required=True, help="respondents to generate")
+    parser.add_argument('--output', type=Path, required=True, help="output .csv or .parquet file")
+    parser.add_argument('--input', type=Path, default=None,
+                        help="real survey CSV to learn from (defaults to music_survey_data.csv)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows generated and written per chunk")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    main(rows=args.rows, output=args.output, data_path=args.input, chunk_rows=args.chunk_rows, seed=args.seed)
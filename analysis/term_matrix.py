@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Sparse document-term matrices for the open-ended answers
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Tokenizes an open-ended column (Q16, Q18, Q19) once into a CSR matrix of
+term counts, one row per response and one column per term. Word
+frequencies, top-N lists and per-persona or per-demographic term counts
+are all read off that matrix, so the text is never tokenized twice.
+
+Tokens are the runs of word characters in the lowercased answer, without
+stop words and words shorter than three letters; the same tokens the old
+join-and-split word count produced. Terms are numbered in order of first
+use, so top-N ties come out in the same order as Counter.most_common.
+
+Distinct answers are tokenized in batches with pandas string methods, and
+each batch becomes a small CSR block, so memory depends on the number of
+distinct answers and tokens rather than on one concatenated string.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DEFAULT_BATCH_SIZE = 100000
+MIN_TERM_LENGTH = 3
+TOKEN_PATTERN = r'\w+'
+
+# Stop words of the shared term matrices; a reader wanting fewer terms
+# leaves them out at read time (see TermMatrix.top_terms)
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'can', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'its', 'our', 'their'}
+
+# Terms the theme-song word cloud leaves out on top of STOP_WORDS, via
+# TermMatrix.top_terms(exclude=...). Its original stop-word set had these
+# two more words; keeping them out of STOP_WORDS leaves the sentiment
+# word counts as they were
+WORD_CLOUD_EXCLUDED_TERMS = {'not', 'sure'}
+
+
+def tokenize(texts, stop_words=STOP_WORDS, min_length=MIN_TERM_LENGTH):
+    """Tokens of each text as a long Series indexed by the text's position"""
+    texts = pd.Series(np.asarray(texts, dtype=object)).astype(str)
+    tokens = texts.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    return tokens[(tokens.str.len() >= min_length) & ~tokens.isin(stop_words)]
+
+
+def top_counts(counts, terms, n):
+    """The n largest counts as {term: count}, ties in order of first use"""
+    nonzero = np.flatnonzero(counts)
+    order = nonzero[np.lexsort((nonzero, -counts[nonzero]))][:n]
+    return dict(zip(terms[order].tolist(), counts[order].tolist()))
+
+
+class TermMatrix:
+    """Term counts of a column of responses (rows in the order given)"""
+    
+    def __init__(self, matrix, vocabulary, index=None):
+        self.matrix = matrix
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.index = index
+    
+    def frequencies(self):
+        """Total count of every term, in vocabulary order"""
+        return np.asarray(self.matrix.sum(axis=0)).ravel()
+    
+    def top_terms(self, n=20, exclude=()):
+        """Most frequent terms as {term: count}, leaving out the terms in exclude"""
+        counts = self.frequencies()
+        if exclude:
+            counts = np.where(np.isin(self.vocabulary, list(exclude)), 0, counts)
+        return top_counts(counts, self.vocabulary, n)
+    
+    def group_counts(self, labels):
+        """Groups (sorted) and their groups x terms count matrix; responses without a label are left out"""
+        codes, groups = pd.factorize(pd.Series(labels), sort=True)
+        labelled = np.flatnonzero(codes >= 0)
+        # Indicator matrix (groups x responses) times the document-term matrix
+        indicator = sparse.csr_matrix((np.ones(len(labelled), dtype=np.int64), (codes[labelled], labelled)),
+                                      shape=(len(groups), self.matrix.shape[0]))
+        return groups.tolist(), (indicator @ self.matrix).tocsr()
+    
+    def top_terms_by_group(self, labels, n=10):
+        """Most frequent terms of each group as {group: {term: count}}, ties in order of first use in the column"""
+        groups, counts = self.group_counts(labels)
+        return {group: top_counts(counts[i].toarray().ravel(), self.vocabulary, n)
+                for i, group in enumerate(groups)}
+
+
+def build_term_matrix(responses, stop_words=STOP_WORDS, min_length=MIN_TERM_LENGTH, batch_size=DEFAULT_BATCH_SIZE):
+    """Tokenize responses once into a TermMatrix (missing answers have no terms)"""
+    responses = pd.Series(responses)
+    # Repeated answers are tokenized once; factorize keeps first-appearance
+    # order, so term ids stay in order of first use
+    codes, uniques = pd.factorize(responses)
+    term_ids = {}
+    blocks = []
+    for start in range(0, len(uniques), batch_size):
+        batch = uniques[start:start + batch_size]
+        tokens = tokenize(batch, stop_words, min_length)
+    
+        token_codes, batch_terms = pd.factorize(tokens)
+        for term in batch_terms:
+            term_ids.setdefault(term, len(term_ids))
+        columns = np.array([term_ids[term] for term in batch_terms], dtype=np.int64)[token_codes]
+        rows = tokens.index.to_numpy()
+        blocks.append(sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, columns)),
+                                        shape=(len(batch), len(term_ids))))
+    
+    # Earlier blocks were built against a smaller vocabulary
+    for block in blocks:
+        block.resize(block.shape[0], len(term_ids))
+    # One empty row for missing answers (code -1)
+    blocks.append(sparse.csr_matrix((1, len(term_ids)), dtype=np.int64))
+    unique_matrix = sparse.vstack(blocks, format='csr')
+    
+    vocabulary = np.empty(len(term_ids), dtype=object)
+    vocabulary[:] = list(term_ids)
+    return TermMatrix(unique_matrix[codes], vocabulary, responses.index)
+
+
+def concat_term_matrices(parts):
+    """Stack TermMatrix parts built on consecutive row ranges, merging their vocabularies"""
+    # Terms new to each part are appended in its own first-use order, which
+    # keeps the vocabulary identical to one build over all the rows
+    term_ids = {}
+    mappings = []
+    for part in parts:
+        for term in part.vocabulary:
+            term_ids.setdefault(term, len(term_ids))
+        mappings.append(np.array([term_ids[term] for term in part.vocabulary], dtype=np.int64))
+    
+    blocks = []
+    for part, mapping in zip(parts, mappings):
+        coo = part.matrix.tocoo()
+        blocks.append(sparse.csr_matrix((coo.data, (coo.row, mapping[coo.col])),
+                                        shape=(part.matrix.shape[0], len(term_ids))))
+    vocabulary = np.empty(len(term_ids), dtype=object)
+    vocabulary[:] = list(term_ids)
+    index = parts[0].index.append([part.index for part in parts[1:]])
+    return TermMatrix(sparse.vstack(blocks, format='csr'), vocabulary, index)
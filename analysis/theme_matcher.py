@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Emotional theme matcher for open-ended answers
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Compiles the keywords of every emotion into one regular expression, laid
+out as a character trie so the engine branches on one letter at a time,
+and scans each response once for all of them. Keywords only match whole
+words ("fun" does not match "funeral"); a keyword ending in '*' matches
+any word starting with it ("nostalgi*" matches "nostalgia" and
+"nostalgic"). Each match is mapped back to its emotion by a dictionary
+lookup.
+
+Distinct responses are lowercased and matched in batches: each batch is
+joined into one string, scanned once, and the match positions are mapped
+back to rows with a binary search, so the per-response work happens
+inside the regex engine. Repeated answers are only scanned once.
+
+The lexicon is a JSON object of {emotion: [keywords]} in emotion_lexicon.json
+next to this file; another file can be passed with --lexicon.
+"""
+
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+EMOTION_LEXICON_FILE = Path(__file__).parent / "emotion_lexicon.json"
+DEFAULT_BATCH_SIZE = 100000
+SEPARATOR = '\n'
+
+
+def load_emotion_lexicon(path=None):
+    """Read the {emotion: [keywords]} lexicon, rejecting keywords listed twice"""
+    with open(path or EMOTION_LEXICON_FILE, 'r', encoding='utf-8') as f:
+        lexicon = json.load(f)
+    
+    seen = {}
+    for emotion, keywords in lexicon.items():
+        for keyword in keywords:
+            key = keyword.lower()
+            if key in seen:
+                raise ValueError(f"Keyword '{keyword}' is listed under both '{seen[key]}' and '{emotion}'")
+            seen[key] = emotion
+    return lexicon
+
+
+def build_trie(keywords):
+    """Character trie of the lowercased keywords; '' marks a word end ('*' for a stem)"""
+    trie = {}
+    for keyword in keywords:
+        stem = keyword.endswith('*')
+        node = trie
+        for char in keyword.lower().rstrip('*'):
+            node = node.setdefault(char, {})
+        node[''] = '*' if stem else ''
+    return trie
+
+
+def trie_regex(node):
+    """Regex for a trie, so the engine branches on one character at a time"""
+    if node.get('') == '*':
+        # A stem matches the rest of the word, covering any longer keyword
+        return r'\w*'
+    branches = [re.escape(char) + trie_regex(child) for char, child in sorted(node.items()) if char]
+    if '' in node:
+        return '(?:' + '|'.join(branches) + ')?' if branches else ''
+    return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+
+class ThemeMatcher:
+    """One compiled pattern for every emotion's keywords"""
+    
+    def __init__(self, lexicon):
+        self.emotions = list(lexicon)
+        self.words = {}
+        self.stems = []
+        for index, keywords in enumerate(lexicon.values()):
+            for keyword in keywords:
+                if keyword.endswith('*'):
+                    self.stems.append((keyword[:-1].lower(), index))
+                else:
+                    self.words[keyword.lower()] = index
+        self.stems.sort(key=lambda stem: len(stem[0]), reverse=True)
+    
+        keywords = [keyword for keywords in lexicon.values() for keyword in keywords]
+        # Matched on lowercased text: case-insensitive matching is much slower in re
+        self.pattern = re.compile(r'(?<!\w)' + trie_regex(build_trie(keywords)) + r'\b')
+    
+    def emotion_index(self, word):
+        """Emotion of a matched word (exact keyword first, then the longest stem)"""
+        index = self.words.get(word)
+        if index is not None:
+            return index
+        return next(index for stem, index in self.stems if word.startswith(stem))
+    
+    def match_distinct(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        """Boolean matrix (texts x emotions) for a list of distinct answers"""
+        texts = pd.Series(np.asarray(texts, dtype=object)).astype(str).str.lower()
+        flags = np.zeros((len(texts), len(self.emotions)), dtype=bool)
+        for start in range(0, len(texts), batch_size):
+            batch = texts.iloc[start:start + batch_size]
+            # Row start offsets in the joined batch
+            lengths = batch.str.len().to_numpy() + len(SEPARATOR)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    
+            hits = [(m.start(), m.group()) for m in self.pattern.finditer(SEPARATOR.join(batch))]
+            if not hits:
+                continue
+            positions = np.array([position for position, _ in hits])
+            emotions = np.array([self.emotion_index(word) for _, word in hits])
+            rows = np.searchsorted(offsets, positions, side='right') - 1
+            flags[start + rows, emotions] = True
+        return flags
+    
+    def match(self, responses, batch_size=DEFAULT_BATCH_SIZE):
+        """Boolean matrix (responses x emotions): which themes each response mentions"""
+        # Repeated answers (song titles, "Bohemian Rhapsody") are scanned once
+        codes, uniques = pd.factorize(pd.Series(responses))
+        flags = self.match_distinct(uniques, batch_size)
+        # Missing answers (code -1) pick the empty row appended last
+        flags = np.vstack([flags, np.zeros((1, len(self.emotions)), dtype=bool)])
+        return flags[codes]
+    
+    def counts(self, responses):
+        """Number of responses mentioning each emotion, in lexicon order"""
+        # Weighting distinct answers by frequency avoids a responses x emotions matrix
+        frequencies = pd.Series(responses).value_counts()
+        flags = self.match_distinct(frequencies.index)
+        return (frequencies.to_numpy() @ flags).tolist()
+    
+    def summarize(self, counts, total):
+        """Count and percentage of responses mentioning each emotion (emotions never mentioned are left out)"""
+        return {
+            emotion: {'count': count, 'percentage': (count / total) * 100}
+            for emotion, count in zip(self.emotions, counts) if count > 0
+        }
+    
+    def themes(self, responses):
+        """Count and percentage of responses mentioning each emotion"""
+        return self.summarize(self.counts(responses), len(responses))
+
+
+@lru_cache(maxsize=None)
+def theme_matcher(path=None):
+    """Compiled matcher for a lexicon file (the default lexicon if None), built once per file"""
+    return ThemeMatcher(load_emotion_lexicon(path))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+On-disk tokenization cache for the open-ended answers
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+The sentiment analysis and the visualizations both read tokenized
+open-ended answers. Each column's term matrix (see term_matrix.py) is
+stored with joblib under data/cache/tokens/<column>/, keyed by:
+
+- a hash of the column's content (values and row labels),
+- the canonical stop words and token settings,
+- the source of term_matrix.py.
+
+So a text column is tokenized once per data version, whichever stage
+asks for it first, and any change to the tokenizer invalidates the cache.
+"""
+
+import hashlib
+
+import joblib
+import pandas as pd
+
+import term_matrix
+from pipeline_cache import prune_step, step_key
+from survey_cache import CACHE_DIR
+from term_matrix import MIN_TERM_LENGTH, STOP_WORDS, TOKEN_PATTERN, build_term_matrix
+
+TOKEN_CACHE_DIR = CACHE_DIR / "tokens"
+
+# Placeholder answers that carry no text
+NON_ANSWERS = ("Not sure", ".")
+
+
+def open_ended_responses(df, column):
+    """A column's answers without missing values and placeholder answers"""
+    responses = df[column].dropna()
+    return responses[~responses.isin(NON_ANSWERS)]
+
+
+def column_hash(responses):
+    """SHA-256 of a column's values and row labels (equal for categorical and plain text)"""
+    row_hashes = pd.util.hash_pandas_object(pd.Series(responses), index=True).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def term_matrix_path(responses, name, cache_dir=TOKEN_CACHE_DIR):
+    """Cache file for the term matrix of a column"""
+    params = {'stop_words': sorted(STOP_WORDS), 'min_length': MIN_TERM_LENGTH, 'token_pattern': TOKEN_PATTERN}
+    key = step_key(name, term_matrix, params, upstream=[column_hash(responses)])
+    return cache_dir / name / f"{key}.joblib"
+
+
+def load_term_matrix(responses, name, cache_dir=TOKEN_CACHE_DIR):
+    """The cached term matrix of a column, or None"""
+    path = term_matrix_path(responses, name, cache_dir)
+    if not path.exists():
+        return None
+    path.touch()
+    return joblib.load(path)
+
+
+def save_term_matrix(terms, responses, name, cache_dir=TOKEN_CACHE_DIR):
+    """Store a column's term matrix"""
+    path = term_matrix_path(responses, name, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    joblib.dump(terms, tmp_path)
+    tmp_path.replace(path)
+    prune_step(path.parent)
+    return path
+
+
+def cached_term_matrix(responses, name, refresh=False, cache_dir=TOKEN_CACHE_DIR):
+    """Term matrix of a column, tokenized only if this content has not been seen before"""
+    terms = None if refresh else load_term_matrix(responses, name, cache_dir)
+    if terms is None:
+        terms = build_term_matrix(responses)
+        save_term_matrix(terms, responses, name, cache_dir)
+    return terms
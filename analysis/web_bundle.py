@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Sharded, precompressed persona bundle for the web frontend
+Vancouver AI Hackathon Round 4: The Soundtrack of Us
+
+Instead of one pretty-printed personas.json, the frontend gets:
+
+- personas.manifest.json: a compact index with each persona's name,
+  colour, size and the characteristics the quiz matches against, plus
+  the path of its shard;
+- personas/persona_<id>.<hash>.json: the full persona, named after a hash
+  of its content so it can be cached forever and a changed persona gets
+  a new URL.
+
+The quiz classifies against the manifest and then fetches only the
+matched persona's shard. Every file, including survey_data.json and any
+chart data, is written without indentation and with .gz (and, when the
+brotli package is installed, .br) siblings for static servers that serve
+precompressed assets.
+
+Usage:
+    python web_bundle.py
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - .br siblings are optional
+    brotli = None
+
+PROCESSED_DIR = Path(__file__).parent.parent / "data" / "processed"
+WEB_DATA_DIR = Path(__file__).parent.parent / "web" / "public" / "data" / "processed"
+MANIFEST_FILE = "personas.manifest.json"
+SHARD_DIR = "personas"
+HASH_LENGTH = 10
+CHART_DATA_FILES = ('survey_data.json', 'chart_data.json')
+
+
+def compact_json(data):
+    """UTF-8 JSON without indentation or padding"""
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def content_hash(payload):
+    """Short SHA-256 of a payload, used in shard filenames"""
+    return hashlib.sha256(payload).hexdigest()[:HASH_LENGTH]
+
+
+def write_precompressed(path, payload):
+    """Write a file with .gz and (if available) .br siblings; returns the paths"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(payload)
+    written = [path]
+    
+    # mtime=0 keeps the gzip bytes identical across runs
+    gz_path = path.with_name(path.name + '.gz')
+    gz_path.write_bytes(gzip.compress(payload, compresslevel=9, mtime=0))
+    written.append(gz_path)
+    if brotli is not None:
+        br_path = path.with_name(path.name + '.br')
+        br_path.write_bytes(brotli.compress(payload, quality=11))
+        written.append(br_path)
+    return written
+
+
+def manifest_entry(key, persona, shard):
+    """What the quiz needs to match and list a persona without its shard"""
+    return {
+        'key': key,
+        'id': persona['id'],
+        'name': persona.get('name'),
+        'color': persona.get('color'),
+        'size': persona['size'],
+        'percentage': round(persona['percentage'], 2),
+        'characteristics': persona['characteristics'],
+        'shard': shard
+    }
+
+
+def publish_personas(personas, web_dir=WEB_DATA_DIR):
+    """Write one content-hashed shard per persona and the manifest"""
+    web_dir = Path(web_dir)
+    shard_dir = web_dir / SHARD_DIR
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    
+    entries = []
+    current = set()
+    for key, persona in personas.items():
+        payload = compact_json(persona)
+        name = f"persona_{persona['id']}.{content_hash(payload)}.json"
+        current.update(path.name for path in write_precompressed(shard_dir / name, payload))
+        entries.append(manifest_entry(key, persona, f"{SHARD_DIR}/{name}"))
+    
+    # Old shards are unreachable once the manifest points at new hashes
+    for stale in shard_dir.glob('persona_*.json*'):
+        if stale.name not in current:
+            stale.unlink()
+    
+    manifest = {'version': content_hash(compact_json(entries)), 'personas': entries}
+    write_precompressed(web_dir / MANIFEST_FILE, compact_json(manifest))
+    
+    # The single-file export stays available for older clients
+    write_precompressed(web_dir / "personas.json", compact_json(personas))
+    return manifest
+
+
+def publish_chart_data(personas=None, source_dir=PROCESSED_DIR, web_dir=WEB_DATA_DIR):
+    """Compact and precompress survey_data.json and any chart data files"""
+    source_dir = Path(source_dir)
+    web_dir = Path(web_dir)
+    published = []
+    for name in CHART_DATA_FILES:
+        source = source_dir / name
+        if not source.exists():
+            source = web_dir / name
+        if not source.exists():
+            continue
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    
+        # The dashboard's persona filter reads sizes from the survey data
+        if name == 'survey_data.json' and personas:
+            data['persona_distribution'] = {persona.get('name', key): persona['size']
+                                            for key, persona in personas.items()}
+        write_precompressed(web_dir / name, compact_json(data))
+        published.append(web_dir / name)
+    return published
+
+
+def export_web_bundle(personas, source_dir=PROCESSED_DIR, web_dir=WEB_DATA_DIR):
+    """Publish the persona manifest, shards and chart data for the frontend"""
+    print("\nExporting web bundle...")
+    manifest = publish_personas(personas, web_dir)
+    published = publish_chart_data(personas, source_dir, web_dir)
+    
+    print(f"   Manifest ({len(manifest['personas'])} personas) exported to: {Path(web_dir) / MANIFEST_FILE}")
+    for path in published:
+        print(f"   Chart data exported to: {path}")
+    if brotli is None:
+        print("   brotli not installed; wrote .gz siblings only")
+    return manifest
+
+
+def main():
+    """Rebuild the web bundle from the processed persona and survey exports"""
+    parser = argparse.ArgumentParser(description="Publish personas and chart data for the web frontend")
+    parser.add_argument('--source-dir', type=Path, default=PROCESSED_DIR)
+    parser.add_argument('--web-dir', type=Path, default=WEB_DATA_DIR)
+    args = parser.parse_args()
+    
+    with open(args.source_dir / "personas.json", 'r', encoding='utf-8') as f:
+        personas = json.load(f)
+    export_web_bundle(personas, args.source_dir, args.web_dir)
+
+
+if __name__ == "__main__":
+    main()
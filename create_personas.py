@@ -7,14 +7,17 @@ Vancouver AI Hackathon Round 4: The Soundtrack of Us
 import pandas as pd
 import json
 import os
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "analysis"))
+from survey_cache import load_survey_data
+
 def main():
     print("🎵 Creating Canadian Music DNA Personas...")
     
     # Load data
-    data_path = Path("..") / "vanai-hackathon-004-master" / "data" / "raw" / "music_survey_data.csv"
-    df = pd.read_csv(data_path)
+    df = load_survey_data()
     print(f"Dataset loaded: {len(df)} responses")
     
     # Create personas based on key characteristics
@@ -74,6 +74,23 @@ self.addEventListener('fetch', (event) => {
     return
   }
   
+  // The persona manifest names the current content-hashed shards, so always
+  // revalidate it; the shards themselves never change and stay cache-first
+  if (url.pathname === '/data/processed/personas.manifest.json') {
+    event.respondWith(
+      fetch(request)
+        .then((response) => {
+          if (response && response.status === 200) {
+            const responseToCache = response.clone()
+            caches.open(DYNAMIC_CACHE).then((cache) => cache.put(request, responseToCache))
+          }
+          return response
+        })
+        .catch(() => caches.match(request))
+    )
+    return
+  }
+  
   event.respondWith(
     caches.match(request)
       .then((cachedResponse) => {
@@ -15,7 +15,7 @@ import BuddyBrowser from './components/BuddyBrowser'
 // Audio test components removed for production
 
 // Data
-import { loadPersonas, loadSurveyData, classifyPersona, Persona, SurveyData } from './utils/dataLoader'
+import { loadPersonas, loadPersonaDetails, loadSurveyData, classifyPersona, Persona, SurveyData } from './utils/dataLoader'
 import { loadFromLocalStorage } from './utils/exportUtils'
 
 // Types
@@ -75,7 +75,8 @@ const App: React.FC = () => {
     // Simulate ML classification delay
     await new Promise(resolve => setTimeout(resolve, 1500))
     
-    const result = classifyPersonaLocal(answers)
+    // Only the matched persona's full profile is downloaded
+    const result = await loadPersonaDetails(classifyPersonaLocal(answers))
     setPersonaResult(result)
     setIsLoading(false)
     setCurrentState('result')
@@ -1467,7 +1467,7 @@ const RealDataCharts: React.FC<RealDataChartsProps> = ({
             .replace('8-tracks to cassette tapes', '8-tracks → Cassettes')
             .replace('Vinyl to 8-tracks', 'Vinyl → 8-tracks')
             .replace('Cassettes to CDs 💿', 'Cassettes → CDs 💿')
-            .replace("I haven't really experienced a big format change", "No big change")
+            .replace(/I haven['’]t really experienced a big format change/, "No big change")
         }
         return key
       })
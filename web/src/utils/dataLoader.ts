@@ -16,6 +16,8 @@ export interface Persona {
   }
   size: number
   percentage: number
+  // Content-hashed file with the full persona (set when loaded from the manifest)
+  shard?: string
 }
 
 export interface SurveyData {
@@ -262,10 +264,38 @@ const mockSurveyData: SurveyData = {
 }
 
 // Data loading functions
+const DATA_ROOT = '/data/processed'
+
+// Persona text (description, traits) fetched so far, by shard path
+const personaShards = new Map<string, Promise<Persona>>()
+
 export const loadPersonas = async (): Promise<Persona[]> => {
   try {
-    // Try to load real data first
-    const response = await fetch('/data/processed/personas.json')
+    // The compact manifest is enough to list and classify personas
+    const response = await fetch(`${DATA_ROOT}/personas.manifest.json`, { cache: 'no-cache' })
+    if (response.ok) {
+      const manifest = await response.json()
+      const personas: Persona[] = manifest.personas.map((persona: any) => ({
+        id: persona.id,
+        name: persona.name,
+        description: '',
+        traits: [],
+        color: persona.color,
+        characteristics: persona.characteristics,
+        size: persona.size,
+        percentage: persona.percentage,
+        shard: persona.shard
+      }))
+      console.log('Loaded persona manifest:', personas.length, 'personas')
+      return personas
+    }
+  } catch (error) {
+    console.warn('Could not load persona manifest, trying personas.json:', error)
+  }
+
+  try {
+    // Fall back to the single-file export
+    const response = await fetch(`${DATA_ROOT}/personas.json`)
     if (response.ok) {
       const realData = await response.json()
       // Convert the real data format to our Persona interface
@@ -292,10 +322,36 @@ export const loadPersonas = async (): Promise<Persona[]> => {
   })
 }
 
+// Fetch the full persona (description, traits) from its shard. Shard names
+// carry a content hash, so the browser may cache them indefinitely.
+export const loadPersonaDetails = async (persona: Persona): Promise<Persona> => {
+  if (!persona.shard) {
+    return persona
+  }
+  const shard = persona.shard
+  if (!personaShards.has(shard)) {
+    personaShards.set(shard, fetch(`${DATA_ROOT}/${shard}`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Persona shard ${shard} returned ${response.status}`)
+        }
+        return response.json()
+      })
+      .then((details: any) => ({ ...persona, description: details.description, traits: details.traits })))
+  }
+  try {
+    return await personaShards.get(shard)!
+  } catch (error) {
+    personaShards.delete(shard)
+    console.warn('Could not load persona details:', error)
+    return persona
+  }
+}
+
 export const loadSurveyData = async (): Promise<SurveyData> => {
   try {
     // Try to load real data first
-    const response = await fetch('/data/processed/survey_data.json')
+    const response = await fetch(`${DATA_ROOT}/survey_data.json`)
     if (response.ok) {
       const realData = await response.json()
       console.log('Loaded real survey data:', realData.total_responses, 'responses')